@@ -0,0 +1,263 @@
+'''
+benchmark.py
+Hussein Esmail
+Created: 2026 10 18
+Description: Benchmarks for yorku_scheduler.py. Times every stage of the
+    program separately, and how long a whole run takes to look up one room
+    from a cached index, on a JSON file from
+    https://github.com/hussein-esmail7/yorku-class-scraper, or on a synthetic
+    one in the same format, and prints the results as JSON so they can be
+    compared between versions.
+
+Test commands:
+python3 benchmark.py -s "F" -j "../yorku-class-scraper/json/2022_fw.json"
+python3 benchmark.py --courses 5000 --meetings 6 --rooms 300 --terms "F,W,Y" -o results.json
+'''
+
+from datetime import datetime as dt
+from datetime import timedelta as td
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+import yorku_scheduler as ys
+
+# ========= VARIABLES ===========
+NUM_REPEAT          = 5 # Best of this many runs is reported
+SEED                = 0 # Random seed, so the same scale gives the same file
+DEPARTMENTS         = ["AP", "ED", "FA", "GS", "HH", "LE", "SC"]
+CODES               = ["ADMS", "BIOL", "CHEM", "ECON", "EECS", "ENG", "HIST",
+                       "MATH", "PHYS", "PSYC"]
+TYPES               = ["LECT", "LECT", "TUTR", "LAB", "SEMR", "BLEN"]
+DAYS                = "MTWRF"
+DURATIONS           = [50, 80, 110, 170]
+BUILDINGS           = ["ACW", "CB", "CLH", "DB", "LAS", "LSB", "R", "SLH", "VH"]
+
+
+def generate_json(PATH_JSON, num_courses, num_meetings, num_rooms, terms):
+    # Write a JSON file in the same format as yorku-class-scraper with
+    # `num_courses` courses of `num_meetings` meetings each, spread over
+    # `num_rooms` rooms and the semesters in `terms`
+    rng = random.Random(SEED)
+    rooms = [f"{BUILDINGS[i % len(BUILDINGS)]} {100 + i // len(BUILDINGS)}" for i in range(num_rooms)]
+    courses = []
+    for course_num in range(num_courses):
+        meetings = []
+        for meeting_num in range(num_meetings):
+            meetings.append({
+                "Section": "ABCDEFGH"[meeting_num // 4 % 8],
+                "Type": rng.choice(TYPES),
+                "Num": str(meeting_num % 4 + 1).zfill(2),
+                "Day": rng.choice(DAYS),
+                "Time": f"{rng.randint(8, 18)}:{rng.choice(['00', '30'])}",
+                "Duration": str(rng.choice(DURATIONS)),
+                "Location": rng.choice(rooms)
+                })
+        courses.append({
+            "Department": rng.choice(DEPARTMENTS),
+            "Code": rng.choice(CODES),
+            "Num": str(1000 + course_num % 4000),
+            "Term": rng.choice(terms),
+            "Meetings": meetings
+            })
+    json.dump(courses, open(PATH_JSON, "w"), indent=4)
+
+
+def end_time_strptime(meeting):
+    # How the end time used to be calculated, kept here to compare against
+    time = ys.format_time(meeting.start)
+    t_1_h = time.split(":")[0] # Hour, 0-23
+    t_1_m = time.split(":")[1] # Min,  00-59
+    t_1 = dt.strptime(t_1_h + ":" + t_1_m, "%H:%M")
+    t_2 = t_1 + td(minutes=meeting.duration)
+    return time + "-" + str(int(t_2.strftime("%H"))) + ":" + str(t_2.strftime("%M"))
+
+
+def end_time_minutes(meeting):
+    # How `make_latex_lines` calculates the end time now
+    return ys.format_time(meeting.start) + "-" + ys.format_time(meeting.start + meeting.duration)
+
+
+def time_stage(function):
+    # Best time in seconds of calling `function()` NUM_REPEAT times, and what
+    # it returned
+    times = []
+    for repeat_num in range(NUM_REPEAT):
+        t_start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - t_start)
+    return min(times), result
+
+
+def bench_end_times(meetings):
+    # Compare the old and new way of calculating the end time of every
+    # meeting. Both have to give the same strings
+    for meeting in meetings:
+        if end_time_strptime(meeting) != end_time_minutes(meeting):
+            print(f"{ys.str_prefix_err} Results differ for {meeting}", file=sys.stderr)
+            sys.exit(1)
+    t_old = min(timeit.repeat(lambda: [end_time_strptime(meeting) for meeting in meetings], number=1, repeat=NUM_REPEAT))
+    t_new = min(timeit.repeat(lambda: [end_time_minutes(meeting) for meeting in meetings], number=1, repeat=NUM_REPEAT))
+    return {"end_time_strptime": t_old, "end_time_minutes": t_new}
+
+
+def bench_stages(PATH_JSON, term_use, PATH_TEMPLATE, DIR_OUTPUT):
+    # Time every stage of making the schedules of all rooms in `PATH_JSON`.
+    # Returns ({stage: seconds}, {count: number}, semester used)
+    results = {}
+    results["json_load"], DATA = time_stage(lambda: json.load(open(PATH_JSON)))
+    results["json_stream_and_matching"], rooms = time_stage(lambda: ys.group_meetings(ys.iter_courses(PATH_JSON)))
+    results["location_matching"], rooms = time_stage(lambda: ys.group_meetings(DATA))
+    PATH_DATASET = os.path.join(DIR_OUTPUT, "dataset" + ys.DATASET_SUFFIX)
+    ys.write_dataset(PATH_DATASET, ys.index_key(PATH_JSON), ys.build_index(DATA))
+    results["dataset_open"], _ = time_stage(lambda: ys.load_dataset(PATH_DATASET))
+    results["dataset_all_rooms"], _ = time_stage(lambda: [ys.index_slice(header, location, ys.index_terms(header, location)) for header in [ys.load_dataset(PATH_DATASET)] for location in ys.index_locations(header)])
+    os.remove(PATH_DATASET) # Not written with the schedules below
+    if term_use == "":
+        # Same as batch mode, use the first semester found
+        term_use = sorted([meeting.term for meetings in rooms.values() for meeting in meetings])[0]
+    accepted = ys.semesters_accepted(term_use)
+    results["term_selection"], rooms_term = time_stage(lambda: {location: [meeting for meeting in meetings if meeting.term in accepted] for location, meetings in rooms.items()})
+    results["latex_rendering"], lines = time_stage(lambda: {location: ys.make_latex_lines(meetings, term_use) for location, meetings in rooms_term.items()})
+    template = ys.compile_template(PATH_TEMPLATE)
+    DATA_CONFIG = {"color_bg_lect": "pink", "color_bg_else": "lightgray", "color_fg_lect": "black", "color_fg_else": "black"}
+    results["template_substitution"], texts = time_stage(lambda: {location: ys.fill_template(template, ys.room_filename(location), location, term_use, DATA_CONFIG, lines[location][0], lines[location][1]) for location in lines.keys()})
+    results["file_write"], _ = time_stage(lambda: [open(os.path.join(DIR_OUTPUT, ys.room_filename(location)), "w").write(text) for location, text in texts.items()])
+    results.update(bench_end_times([meeting for meetings in rooms_term.values() for meeting in meetings]))
+    counts = {
+        "courses": len(DATA),
+        "meetings": sum([len(meetings) for meetings in rooms.values()]),
+        "meetings_in_term": sum([len(meetings) for meetings in rooms_term.values()]),
+        "rooms": len(rooms),
+        "lines": sum([len(lines[location][0]) for location in lines.keys()]),
+        "bytes_written": sum([len(text) for text in texts.values()])
+        }
+    return results, counts, term_use
+
+
+def time_process(command, env, DIR_OUTPUT, PATH_REMOVE=""):
+    # Best wall time in seconds of running `command` NUM_REPEAT times, from
+    # starting Python to it exiting. `PATH_REMOVE` is deleted before every
+    # run, since --strict does not overwrite files
+    times = []
+    for repeat_num in range(NUM_REPEAT):
+        if os.path.exists(PATH_REMOVE):
+            os.remove(PATH_REMOVE)
+        t_start = time.perf_counter()
+        result = subprocess.run(command, env=env, cwd=DIR_OUTPUT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        times.append(time.perf_counter() - t_start)
+        if result.returncode != 0:
+            print(f"{ys.str_prefix_err} {' '.join(command)} exited with {result.returncode}", file=sys.stderr)
+            sys.exit(1)
+    return min(times)
+
+
+def bench_startup(PATH_JSON, term_use, DIR_OUTPUT):
+    # Time whole runs of the program that look up one room from an index
+    # that is already cached, like a cron job would. The JSON file is copied
+    # to `DIR_OUTPUT` so its index is not written next to the original.
+    # Returns ({stage: seconds}, room used)
+    PATH_COPY = shutil.copy(PATH_JSON, os.path.join(DIR_OUTPUT, "startup.json"))
+    header = ys.load_index(PATH_COPY, False) # Builds the index cache
+    # First room with meetings in the semester, so the run has output
+    location = [location for location in ys.index_locations(header) if len(ys.index_slice(header, location, ys.semesters_accepted(term_use))) > 0][0]
+    DIR_REPO = os.path.dirname(os.path.abspath(ys.__file__))
+    env = dict(os.environ, PYTHONPATH=DIR_REPO)
+    # Let `-m` use the bytecode cache like it normally would
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    args = ["--strict", "-q", "-j", PATH_COPY, "-r", location, "-s", term_use, "-o", "startup", "--format", "csv"]
+    PATH_REMOVE = os.path.join(DIR_OUTPUT, "startup.csv")
+    subprocess.run([sys.executable, "-c", "import yorku_scheduler"], env=env) # Write the bytecode cache
+    results = {}
+    results["startup_interpreter"] = time_process([sys.executable, "-c", "pass"], env, DIR_OUTPUT)
+    results["startup_import"] = time_process([sys.executable, "-c", "import yorku_scheduler"], env, DIR_OUTPUT)
+    results["startup_cached_room_script"] = time_process([sys.executable, os.path.join(DIR_REPO, "yorku_scheduler.py")] + args, env, DIR_OUTPUT, PATH_REMOVE)
+    results["startup_cached_room_module"] = time_process([sys.executable, "-m", "yorku_scheduler"] + args, env, DIR_OUTPUT, PATH_REMOVE)
+    return results, location
+
+
+def main():
+    PATH_JSON = ""
+    PATH_OUTPUT = "" # Where to write the results. Printed if not given
+    PATH_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "timetable.tex")
+    term_use = ""
+    num_courses = 2000
+    num_meetings = 6
+    num_rooms = 200
+    terms = ["F", "W", "Y"]
+    args = sys.argv
+    for arg_num, arg in enumerate(args[1:]):
+        if arg == "-h" or arg == "--help":
+            print("--- benchmark.py ---")
+            print()
+            print("Arguments:")
+            print("\t-h, --help\tHelp message and exit program.")
+            print("\t-j, --json\tInput the JSON path as a string. A synthetic\n\t\t\tJSON file is made if this is not given.")
+            print("\t-s, --sem, --semester\n\t\t\tSemester to make the schedules for.")
+            print("\t-o, --output\tFile to write the JSON results to.")
+            print("\t-t, --template\tTemplate file to use.")
+            print("\t--courses\tNumber of courses in the synthetic JSON file.")
+            print("\t--meetings\tNumber of meetings per course.")
+            print("\t--rooms\t\tNumber of rooms.")
+            print("\t--terms\t\tSemesters, separated by commas (\"F,W,Y\").")
+            sys.exit()
+        elif arg == "-j" or arg == "--json":
+            PATH_JSON = os.path.expanduser(args[arg_num+2])
+            if not os.path.exists(PATH_JSON):
+                print(f"{ys.str_prefix_err} JSON file not found!", file=sys.stderr)
+                sys.exit(1)
+        elif arg == "-s" or arg == "--sem" or arg == "--semester":
+            term_use = ys.valid_sem(args[arg_num+2])
+        elif arg == "-o" or arg == "--output":
+            PATH_OUTPUT = args[arg_num+2]
+        elif arg == "-t" or arg == "--template":
+            PATH_TEMPLATE = os.path.expanduser(args[arg_num+2])
+        elif arg == "--courses":
+            num_courses = int(args[arg_num+2])
+        elif arg == "--meetings":
+            num_meetings = int(args[arg_num+2])
+        elif arg == "--rooms":
+            num_rooms = int(args[arg_num+2])
+        elif arg == "--terms":
+            terms = [term.strip() for term in args[arg_num+2].split(",")]
+
+    with tempfile.TemporaryDirectory() as DIR_TEMP:
+        scale = {"source": PATH_JSON}
+        if len(PATH_JSON) == 0:
+            PATH_JSON = os.path.join(DIR_TEMP, "synthetic.json")
+            generate_json(PATH_JSON, num_courses, num_meetings, num_rooms, terms)
+            scale = {"source": "synthetic", "courses": num_courses, "meetings_per_course": num_meetings, "rooms": num_rooms, "terms": terms, "seed": SEED}
+        scale["json_bytes"] = os.path.getsize(PATH_JSON)
+        DIR_OUTPUT = os.path.join(DIR_TEMP, "output")
+        os.makedirs(DIR_OUTPUT)
+        seconds, counts, term_use = bench_stages(PATH_JSON, term_use, PATH_TEMPLATE, DIR_OUTPUT)
+        seconds_startup, room_startup = bench_startup(PATH_JSON, term_use, DIR_OUTPUT)
+        seconds.update(seconds_startup)
+    report = {
+        "version": 1,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": NUM_REPEAT,
+        "semester": term_use,
+        "startup_room": room_startup,
+        "scale": scale,
+        "counts": counts,
+        "seconds": seconds
+        }
+    text_report = json.dumps(report, indent=4)
+    if len(PATH_OUTPUT) > 0:
+        open(PATH_OUTPUT, "w").write(text_report + "\n")
+        print(f"{ys.str_prefix_done} Wrote to '{PATH_OUTPUT}'", file=sys.stderr)
+    else:
+        print(text_report)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,23 +10,64 @@ Test command:
 python3 yorku_scheduler.py -s "F" -j "../yorku-class-scraper/json/2022_fw.json" -r "CLH I"
 '''
 
-from datetime import datetime as dt
-from datetime import timedelta as td
-import configparser     # Used to get configuration file contents
-import getopt           # Used to get argument information
+import array            # Used for compiled dataset columns
+import atexit           # Used to print the --profile report
+import collections      # Used for the Meeting record
+import contextlib
+import io
 import json             # Used to parse JSON data file to program
 import os
+import re
 import sys
+import threading
+import time
+# Modules only some modes use (configparser, csv, datetime, hashlib, html,
+# http.server, mmap, subprocess, tracemalloc, urllib.parse, and
+# concurrent.futures) are imported in the functions that use them, so a
+# single room lookup does not pay for loading them when the program starts
 
 # ========= VARIABLES ===========
 PATH_POST_SCRIPT    = "" # Optional script to run afterwards, passes tex file
 PATH_CONFIG         = "~/.config/yorku-scheduler/config"
 PATH_JSON           = ""
-DATA                = [] # JSON data will go here
 location            = "" # User-inputted location query
 LINE_INSERT         = "[CLASSES START]"
 LINE_CLASSES_INSERT = "[CLASS LIST START]"
+TEMPLATE_FIELDS     = ["FILENAME", "DESCRIPTION", "TITLE", "COLOR_BG_LECT",
+                       "COLOR_BG_ELSE", "COLOR_FG_LECT", "COLOR_FG_ELSE"]
+TEMPLATE_CACHE      = {} # Template path -> (mtime, compiled template)
 BOOL_PRINT_VERBOSE  = False
+INDEX_SUFFIX        = ".idx" # Index cache file is the JSON path + this
+DATASET_SUFFIX      = ".yusd" # Standalone dataset made by `convert -o`
+DATASET_MAGIC       = b"YUSD" # First bytes of a compiled dataset
+DATASET_VERSION     = 1 # Change when the dataset format changes
+DATASET_NUMBER_FIELDS = ("start", "duration") # Meeting fields that aren't text
+MANIFEST_NAME       = ".yorku-scheduler.json" # Batch mode manifest file
+MANIFEST_VERSION    = 5 # Change when the manifest format changes
+DAYS                = "MTWRFSU" # Day letters used in the JSON file
+DAY_START           = 8 * 60 # Default time range to look for free rooms in
+DAY_END             = 22 * 60
+SERVER_PORT         = 8080 # Default port for server mode
+SERVER_CACHE_SIZE   = 256 # Rendered schedules server mode keeps
+PROFILE             = None # Stage -> measurements, only made with --profile
+PROFILE_LOCK        = threading.Lock()
+PROFILE_OFF         = contextlib.nullcontext() # Stage that records nothing
+EXIT_ERROR          = 1 # Exit status for bad arguments and missing files
+EXIT_MISSING        = 2 # Exit status when --strict needs an answer it can't ask
+EXIT_NO_ITEMS       = 3 # Exit status when --strict finds nothing in the room
+EXIT_POST_SCRIPT    = 4 # Exit status when a batch mode post-script failed
+CONFIG_DEFAULTS     = { # Config file values used when they are not set
+    "item_title": "{s} {n} {a}",
+    "item_subtitle": "{t} {s}",
+    "color_bg_lect": "pink",
+    "color_bg_else": "lightgray",
+    "color_fg_lect": "black",
+    "color_fg_else": "black",
+    "path_post_script": "",
+    "path_template": "./timetable.tex",
+    "ics_start": "",
+    "ics_weeks": "12"
+    }
 
 # ========= COLOR CODES =========
 color_end               = '\033[0m'     # Resets color
@@ -46,10 +87,102 @@ str_prefix_y_n          = f"[{color_pink}y/n{color_end}]"
 str_prefix_err          = f"[{color_red}ERROR{color_end}]\t "
 str_prefix_info         = f"[{color_cyan}INFO{color_end}]\t "
 str_prefix_done         = f"[{color_green}DONE{color_end}]\t "
+error_neither_y_n       = "Please type 'y' or 'n' ('q' to quit)!"
+
+# A line with LINE_INSERT or LINE_CLASSES_INSERT (group 1), or a placeholder
+# like "[TITLE]" (group 2)
+TEMPLATE_PATTERN = re.compile(r"^[^\n]*(" + re.escape(LINE_INSERT) + "|"
+        + re.escape(LINE_CLASSES_INSERT) + r")[^\n]*\n?|\[("
+        + "|".join(TEMPLATE_FIELDS) + r")\]", re.MULTILINE)
+
+# One meeting of a course in a room. Replaces the dicts that used to be
+# made for every match.
+#   department -> LE, AP, GS, ...
+#   code -> EECS/ADMS/EN/ENG/...
+#   num -> 1000, 1001, 2001, etc.
+#   section -> A, B, C, ...
+#   type -> LECT, TUTR, SEMR, LAB, ...
+#   num2 -> The 02 in TUTR 02
+#   day -> MTWRF
+#   start -> Start time in minutes since midnight (840 is 14:00)
+#   duration -> Length in minutes
+#   location -> Building and room number
+#   term -> F, W, SU, S1, S2, etc.
+Meeting = collections.namedtuple("Meeting", ["department", "code", "num",
+    "section", "type", "num2", "day", "start", "duration", "location", "term"])
 
 # TODO: If user picked to display SU semester, display 2 tables, one for S1,
 #       one for S2
 
+def profile_start():
+    # Turn on --profile. Until this is called, the profile_* functions do
+    # nothing, so the program does not pay for them
+    import tracemalloc
+    global PROFILE
+    PROFILE = {}
+    tracemalloc.start()
+
+
+def profile_stage(name):
+    # Time a stage of the program and record its peak memory:
+    #   with profile_stage("Render"):
+    #       ...
+    # Stages should not be inside each other, since the peak memory of the
+    # outer stage is reset by the inner one
+    if PROFILE is None:
+        return PROFILE_OFF
+    return _profile_stage(name)
+
+
+@contextlib.contextmanager
+def _profile_stage(name):
+    import tracemalloc
+    tracemalloc.reset_peak()
+    t_start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile_add(name, time.perf_counter() - t_start, tracemalloc.get_traced_memory()[1])
+
+
+def profile_add(name, seconds=0, peak=0, **counts):
+    # Add time and counts (like `Lines=40`) to a stage. Safe to call from the
+    # batch mode workers. Stages that run more than once add up
+    if PROFILE is None:
+        return
+    with PROFILE_LOCK:
+        if name not in PROFILE:
+            PROFILE[name] = {"Seconds": 0, "Calls": 0, "Peak": 0, "Counts": {}}
+        stage = PROFILE[name]
+        if seconds > 0:
+            stage["Seconds"] += seconds
+            stage["Calls"] += 1
+        stage["Peak"] = max(stage["Peak"], peak)
+        for count_name, count in counts.items():
+            stage["Counts"][count_name] = stage["Counts"].get(count_name, 0) + count
+
+
+def profile_iter(name, count_name, items):
+    # Pass `items` through, counting them into the stage `name`
+    count = 0
+    for item in items:
+        count += 1
+        yield item
+    profile_add(name, **{count_name: count})
+
+
+def print_profile(format_profile):
+    # Print what was recorded with --profile, as a table or as JSON
+    if format_profile == "json":
+        print(json.dumps(PROFILE, indent=4))
+        return
+    print(f"{str_prefix_info} Profile:")
+    print(f"\t{'Stage':<12} {'Seconds':>10} {'Calls':>6} {'Peak KiB':>10}  Counts")
+    for name, stage in PROFILE.items():
+        counts = ", ".join([f"{count_name}: {count}" for count_name, count in stage["Counts"].items()])
+        print(f"\t{name:<12} {stage['Seconds']:>10.4f} {stage['Calls']:>6} {stage['Peak']/1024:>10.1f}  {counts}")
+
+
 def valid_sem(semester):
     # Check if the semester input is a valid semester. Return "" otherwise
     valid_semesters = ["Y", "F", "W", "SU", "S1", "S2"]
@@ -115,52 +248,1304 @@ def fb(str1, str2):
         return str2.strip()
     return str1.strip()
 
-def get_config(PATH_CONFIG):
+def get_config(PATH_CONFIG, BOOL_WRITE=True):
+    # Read the config file. Values that are not in it use CONFIG_DEFAULTS.
+    # If the file does not exist, a config file with the default values is
+    # written there (unless `BOOL_WRITE` is False, like in --strict mode)
+    import configparser
     PATH_CONFIG = os.path.expanduser(PATH_CONFIG)
     c = configparser.ConfigParser()
-    if not os.path.exists(PATH_CONFIG):
-        FOLDER_CONFIG = "/".join(PATH_CONFIG.split("/")[:-1])
+    if not os.path.exists(PATH_CONFIG) and BOOL_WRITE:
+        FOLDER_CONFIG = os.path.dirname(PATH_CONFIG)
         if not os.path.exists(FOLDER_CONFIG):
             # Make the config folder if it does not exist
             os.makedirs(FOLDER_CONFIG)
-        open(PATH_CONFIG, 'w').write(c)
-        print(f"{strPrefix_info} Your config file does not exist! Wrote to {PATH_CONFIG}")
+        c.read_dict({"DEFAULT": CONFIG_DEFAULTS})
+        with open(PATH_CONFIG, "w") as f:
+            c.write(f)
+        print(f"{str_prefix_info} Your config file does not exist! Wrote to {PATH_CONFIG}")
     c.read(PATH_CONFIG)
-    config1 = {
-            "item_title": c.get("DEFAULT", "item_title", fallback="{s} {n} {a}"),
-            "item_subtitle": c.get("DEFAULT", "item_subtitle", fallback="{t} {s}"),
-            "color_bg_lect": c.get("DEFAULT", "color_bg_lect", fallback="pink"),
-            "color_bg_else": c.get("DEFAULT", "color_bg_else", fallback="lightgray"),
-            "color_fg_lect": c.get("DEFAULT", "color_fg_lect", fallback="black"),
-            "color_fg_else": c.get("DEFAULT", "color_fg_else", fallback="black"),
-            "path_post_script": os.path.expanduser(c.get("DEFAULT", "path_post_script", fallback="")),
-            "path_template": os.path.expanduser(c.get("DEFAULT", "path_template", fallback="./timetable.tex"))
-            }
+    config1 = {key: c.get("DEFAULT", key, fallback=value) for key, value in CONFIG_DEFAULTS.items()}
+    config1["path_post_script"] = os.path.expanduser(config1["path_post_script"])
+    config1["path_template"] = os.path.expanduser(config1["path_template"])
     return config1
 
 
+def load_settings(formats, BOOL_WRITE=True):
+    # Read the config file, and compile the template if a `.tex` file is
+    # going to be made. Only called once a mode knows it will write output.
+    # Returns (config dict, compiled template or None)
+    with profile_stage("Config"):
+        DATA_CONFIG = get_config(PATH_CONFIG, BOOL_WRITE)
+    template = None
+    if "tex" in formats:
+        with profile_stage("Template"):
+            try:
+                template = compile_template(DATA_CONFIG["path_template"])
+            except ValueError as error:
+                fail(str(error))
+    return DATA_CONFIG, template
+
+
+def fail(message, status=EXIT_ERROR):
+    # Print an error and exit with `status`. Used by --strict mode instead of
+    # asking the user
+    print(f"{str_prefix_err} {message}")
+    sys.exit(status)
+
+
+def compile_template(PATH_TEMPLATE):
+    # Split the template file into literal text and placeholders once, so
+    # rendering a room is a single join. The result is a list where even
+    # indexes are literal text and odd indexes are placeholder names:
+    #   ["... \\def\\myTitle {", "TITLE", "} ...", ...]
+    # The whole line with LINE_INSERT becomes the "CLASSES" placeholder and
+    # the whole line with LINE_CLASSES_INSERT becomes "CLASS_LIST".
+    # Compiled templates are kept in TEMPLATE_CACHE by path and modification
+    # time, so the file is only read again if it changes.
+    # Raises ValueError if the template can't be used, so the server can keep
+    # running with its last good template
+    if not os.path.exists(PATH_TEMPLATE):
+        raise ValueError("Template file does not exist at location!")
+    mtime = os.stat(PATH_TEMPLATE).st_mtime_ns
+    if PATH_TEMPLATE in TEMPLATE_CACHE and TEMPLATE_CACHE[PATH_TEMPLATE][0] == mtime:
+        return TEMPLATE_CACHE[PATH_TEMPLATE][1]
+    text = open(PATH_TEMPLATE, "r").read()
+    template = []
+    pos = 0
+    for match in TEMPLATE_PATTERN.finditer(text):
+        template.append(text[pos:match.start()])
+        if match.group(1) == LINE_INSERT:
+            template.append("CLASSES")
+        elif match.group(1) == LINE_CLASSES_INSERT:
+            template.append("CLASS_LIST")
+        else:
+            template.append(match.group(2))
+        pos = match.end()
+    template.append(text[pos:])
+    if "CLASSES" not in template[1::2]:
+        raise ValueError(f"No insert line in template file! Expected: '{LINE_INSERT}'")
+    TEMPLATE_CACHE[PATH_TEMPLATE] = (mtime, template)
+    return template
+
+
+def render_template(template, values):
+    # Fill in a template from `compile_template`. `values` has a string for
+    # every placeholder name in the template
+    parts = template[:]
+    parts[1::2] = [values.get(name, "") for name in template[1::2]]
+    return "".join(parts)
+
+
+def parse_time(time):
+    # "14:00" -> 840 (minutes since midnight)
+    hour, minute = time.split(":")
+    return int(hour) * 60 + int(minute)
+
+
+def format_time(minutes):
+    # 840 -> "14:00", 570 -> "9:30". Wraps around after midnight
+    return str(minutes // 60 % 24) + ":" + str(minutes % 60).zfill(2)
+
+
+def make_meeting(course, meeting):
+    # Convert a course and one of its meetings from the JSON into a Meeting.
+    # Values that repeat a lot (department, course code, type, day, room,
+    # term) are interned, so every Meeting shares one copy of each.
+    # Raises ValueError if the time or duration can't be read
+    intern = sys.intern
+    start = parse_time(meeting["Time"])
+    duration = int(meeting["Duration"])
+    if not 0 <= start < 24 * 60 or not 0 <= duration <= 24 * 60:
+        raise ValueError(f"Time '{meeting['Time']}' or duration '{meeting['Duration']}' out of range")
+    return Meeting(
+            intern(course["Department"]),
+            intern(course["Code"]),
+            course["Num"],
+            meeting["Section"],
+            intern(meeting["Type"]),
+            meeting["Num"],
+            intern(meeting["Day"]),
+            start,
+            duration,
+            intern(meeting["Location"]),
+            intern(course["Term"])
+        )
+
+
+def iter_courses(PATH_JSON, size_chunk=1 << 16):
+    # Read the courses in the JSON file one at a time instead of loading the
+    # whole list with `json.load`. Only one course (plus the read buffer) is
+    # in memory at a time, so memory use depends on what is kept from each
+    # course, not on the size of the file.
+    decoder = json.JSONDecoder()
+    skip = re.compile(r"[\s,]*") # Whitespace and commas between courses
+    with open(PATH_JSON, "r") as f:
+        buf = f.read(size_chunk)
+        pos = skip.match(buf).end()
+        if not buf[pos:pos+1] == "[":
+            # Not a list of courses. Let `json` handle it (and its errors)
+            f.seek(0)
+            for course in json.load(f):
+                yield course
+            return
+        pos += 1
+        while True:
+            pos = skip.match(buf, pos).end()
+            if pos < len(buf) and buf[pos] == "]":
+                return # End of the list
+            try:
+                course, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # The next course is not fully in the buffer yet. Read more,
+                # at least as much as is already buffered so that a very long
+                # course does not get decoded over and over
+                chunk = f.read(max(size_chunk, len(buf) - pos))
+                if len(chunk) == 0:
+                    raise # End of file in the middle of a course
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+            yield course
+
+
+def group_meetings(DATA, BOOL_PRINTS=True):
+    # Iterate the courses once and bucket every meeting by its location.
+    # `DATA` can be a list or `iter_courses` (which does not keep the courses)
+    # Every room is kept, since the index file is built from all of them.
+    # Meetings whose time or duration can't be read are skipped (and counted)
+    # so one bad entry does not break every room.
+    # Returns {location: [Meeting, ...]}
+    # The reason these are not processed into the file right away is
+    # because there may be multiple terms in the JSON file. Even an SU vs S1
+    # could be an issue (especially if there's an S2 course at the same time)
+    rooms = {}
+    skipped = [] # Rooms of the meetings that were skipped
+    for course in DATA:
+        # For every course
+        for meeting in course["Meetings"]:
+            # For all meetings in the course
+            location = meeting["Location"]
+            if len(location.strip()) == 0:
+                # Online/unscheduled meetings have no room
+                continue
+            try:
+                rooms.setdefault(location, []).append(make_meeting(course, meeting))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                skipped.append(location)
+    if len(skipped) > 0:
+        profile_add("Index", **{"Meetings skipped": len(skipped)})
+        if BOOL_PRINTS:
+            print(f"{str_prefix_err} Skipped {len(skipped)} meetings with a time or duration that can't be read (in {', '.join(sorted(set(skipped))[:5])}{', ...' if len(set(skipped)) > 5 else ''})")
+    return rooms
+
+
+def make_latex_lines(meetings, term_use):
+    # Convert the meetings of one room into the lines that go in the template
+    # Returns (arr_latex_newlines, class_list)
+    arr_latex_newlines = [] # Lines to insert into the LaTeX file will go here
+    for meeting in meetings:
+        if meeting.term == term_use or meeting.term in semesters_accepted(term_use):
+            # If it is the same term as the meeting, or if the user chose SU,
+            # Still include S1 and S2 classes since it happens at the same time
+            weekday_formatted = format_day(meeting.day)
+            # Start and ending time
+            t_2 = format_time(meeting.start) + "-" + format_time(meeting.start + meeting.duration)
+            if meeting.type == "LECT":
+                # LECT has its own colour type.
+                # The reason this is separate is to indicate that you could
+                # potentially drop in and also listen to this lecture. This is
+                # less likely in tutorials (TUTR) and seminars (SEMR)
+                latex_newline = "\t\\" + meeting.type.split(" ")[0] + "{" + meeting.code + " " + meeting.num + " " + meeting.section + "}{" + meeting_type(meeting, term_use) + "}{" + weekday_formatted + "}{" + t_2 + "}\n"
+            else:
+                # Automatically use TUTR if it uses an unknown type
+                latex_newline = "\t\\ELSE{" + meeting.code + " " + meeting.num + " " + meeting.section + "}{" + meeting_type(meeting, term_use) + "}{" + weekday_formatted + "}{" + t_2 + "}\n"
+            # latex_newline = "\t\t\\" + type + "{\\href{" + course['URL'] + "}{" + course['Code'] + " " + course['Num'] + " " + section['Code'] + "}}{" + type + num + "}{" + weekday_formatted + "}{" + t_2 + "}\n" # --> With URL to course page. Useless since you have to restart a session anyway
+            arr_latex_newlines.append(latex_newline)
+            if BOOL_PRINT_VERBOSE: # If user wants everything printed
+                print(latex_newline) # Print the LaTeX line
+
+    class_list = []
+    if len(semesters_accepted(term_use)) > 2:
+        # len(semesters_accepted(term_use)) > 2 explanation:
+        # Only SU and Y terms qualify this. The issue is that the schedule
+        # library in LaTeX does not show multiple events at once, so it takes
+        # the most recent like of the conflicting ones. This means that it may
+        # skip classes. So that there's no data loss, list every group of
+        # classes that happen at the same time along with what term it
+        # actually is
+        accepted = semesters_accepted(term_use)
+        class_list = make_conflict_table(find_overlaps([meeting for meeting in meetings if meeting.term in accepted]), term_use)
+    return arr_latex_newlines, class_list
+
+
+def find_overlaps(meetings):
+    # Groups of meetings that happen at the same time, found with a sweep
+    # over each day's meetings sorted by start time (O(n log n)). A group is
+    # every meeting connected by an overlap, so A 9:00-10:20, B 10:00-11:20
+    # and C 11:00-12:00 are one group even though A and C don't overlap.
+    # Returns a list of groups (lists of meetings, by start time), by day and
+    # start time. Meetings that don't overlap anything are left out
+    groups = []
+    for day in DAYS:
+        day_meetings = sorted([meeting for meeting in meetings if meeting.day == day], key=lambda meeting: (meeting.start, meeting.duration))
+        group = []
+        group_end = -1 # Latest end time in the current group
+        for meeting in day_meetings:
+            if meeting.start >= group_end:
+                # Starts after everything before it ended, new group
+                if len(group) > 1:
+                    groups.append(group)
+                group = []
+            group.append(meeting)
+            group_end = max(group_end, meeting.start + meeting.duration)
+        if len(group) > 1:
+            groups.append(group)
+    return groups
+
+
+def make_conflict_table(groups, term_use):
+    # Lines of a LaTeX table of the groups from `find_overlaps`, one row per
+    # meeting. Empty if there are no groups
+    if len(groups) == 0:
+        return []
+    lines = [
+        "Classes at the same time\\footnote{When displaying Y or SU term, F/W or S1/S2 classes can be at the same time. The schedule above only shows one of them}\n",
+        "\\begin{longtable}{|l|l|l|l|l|}\n",
+        "\t\\hline\n",
+        "\t\\textbf{Day} & \\textbf{Times} & \\textbf{Class} & \\textbf{Type} & \\textbf{Time} \\\\\n",
+        "\t\\hline\n"
+        ]
+    for group in groups:
+        weekday_formatted = format_day(group[0].day)
+        t_group = format_time(group[0].start) + "-" + format_time(max([meeting.start + meeting.duration for meeting in group]))
+        for meeting_num, meeting in enumerate(group):
+            t_2 = format_time(meeting.start) + "-" + format_time(meeting.start + meeting.duration)
+            if meeting_num == 0:
+                # Only the first row of a group says when the group is
+                lines.append("\t" + weekday_formatted + " & " + t_group + " & ")
+            else:
+                lines.append("\t & & ")
+            lines[-1] += meeting.code + " " + meeting.num + " " + meeting.section + " & " + meeting_type(meeting, term_use) + " & " + t_2 + " \\\\\n"
+        lines.append("\t\\hline\n")
+    lines.append("\\end{longtable}\n")
+    return lines
+
+
+def fill_template(template, FILENAME_OUTPUT, location, term_use, DATA_CONFIG, arr_latex_newlines, class_list):
+    # Make substitutions for things line title, room, etc. and put the
+    # schedule lines and class list where the template expects them.
+    # `template` is what `compile_template` returns. Returns the new file
+    # TODO: Use f"Schedule for {location} in {meeting.year} {term_use}" for
+    #       the description and title after "Year" has been added
+    return render_template(template, {
+            "FILENAME": FILENAME_OUTPUT,
+            "DESCRIPTION": f"Schedule for {location} for {term_use}",
+            "TITLE": f"Schedule for {location} for {term_use}",
+            "COLOR_BG_LECT": DATA_CONFIG["color_bg_lect"],
+            "COLOR_BG_ELSE": DATA_CONFIG["color_bg_else"],
+            "COLOR_FG_LECT": DATA_CONFIG["color_fg_lect"],
+            "COLOR_FG_ELSE": DATA_CONFIG["color_fg_else"],
+            "CLASSES": "".join(arr_latex_newlines),
+            "CLASS_LIST": "".join(class_list)
+        })
+
+
+def room_filename(location, extension=".tex"):
+    # File name for a room in batch mode. "CLH I" -> "CLH_I.tex"
+    # Rooms come from the JSON file, so anything but letters, numbers, "_",
+    # "." and "-" becomes "_" (no paths, quotes or shell characters)
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", "_".join(location.replace("/", "-").split())) + extension
+
+
+def output_paths(FILENAME_OUTPUT, formats):
+    # Path of every output format from one file name. The extension of any
+    # format is replaced: "test.tex" with ["tex", "csv"] ->
+    # {"tex": "test.tex", "csv": "test.csv"}
+    for extension, content_type, render in OUTPUT_FORMATS.values():
+        if FILENAME_OUTPUT.endswith(extension):
+            FILENAME_OUTPUT = FILENAME_OUTPUT[:-len(extension)]
+            break
+    return {format_output: FILENAME_OUTPUT + OUTPUT_FORMATS[format_output][0] for format_output in formats}
+
+
+def format_day(day):
+    # Day letter as it is shown. "R" -> "Th"
+    if day == "R":
+        return "Th"
+    return day
+
+
+def meeting_type(meeting, term_use):
+    # "LECT", "TUTR 02", "LAB 01 (W)", ...
+    # The number is only used in labs and tutorials, and the semester is only
+    # shown if it is not the chosen one
+    num = ""
+    if meeting.type == "TUTR" or meeting.type == "LAB":
+        num = " " + meeting.num2
+    if term_use != meeting.term:
+        num += f" ({meeting.term})"
+    return meeting.type + num
+
+
+def sort_meetings(meetings):
+    # Meetings by day of the week, then start time
+    return sorted(meetings, key=lambda meeting: (DAYS.find(meeting.day) % (len(DAYS) + 1), meeting.start))
+
+
+def render_tex(location, term_use, meetings, template, DATA_CONFIG, FILENAME_OUTPUT):
+    # LaTeX schedule, filled into the template
+    arr_latex_newlines, class_list = make_latex_lines(meetings, term_use)
+    profile_add("Render", Lines=len(arr_latex_newlines))
+    return fill_template(template, FILENAME_OUTPUT, location, term_use, DATA_CONFIG, arr_latex_newlines, class_list)
+
+
+def render_csv(location, term_use, meetings, template, DATA_CONFIG, FILENAME_OUTPUT):
+    # One row per meeting, by day and time
+    import csv
+    f = io.StringIO()
+    writer = csv.writer(f, lineterminator="\n")
+    writer.writerow(["Location", "Term", "Day", "Start", "End", "Duration", "Department", "Code", "Num", "Section", "Type", "Num2"])
+    for meeting in sort_meetings(meetings):
+        writer.writerow([meeting.location, meeting.term, meeting.day, format_time(meeting.start), format_time(meeting.start + meeting.duration), meeting.duration, meeting.department, meeting.code, meeting.num, meeting.section, meeting.type, meeting.num2])
+    return f.getvalue()
+
+
+def render_html(location, term_use, meetings, template, DATA_CONFIG, FILENAME_OUTPUT):
+    # Standalone web page with a table of the meetings, by day and time.
+    # Uses the same colours as the LaTeX file
+    import html
+    title = html.escape(f"Schedule for {location} for {term_use}")
+    lines = [
+        "<!DOCTYPE html>",
+        "<html>",
+        "<head>",
+        "<meta charset=\"utf-8\">",
+        f"<title>{title}</title>",
+        "<style>",
+        "table { border-collapse: collapse; }",
+        "th, td { border: 1px solid black; padding: 2px 8px; }",
+        f"tr.lect {{ background: {html.escape(DATA_CONFIG['color_bg_lect'])}; color: {html.escape(DATA_CONFIG['color_fg_lect'])}; }}",
+        f"tr.else {{ background: {html.escape(DATA_CONFIG['color_bg_else'])}; color: {html.escape(DATA_CONFIG['color_fg_else'])}; }}",
+        "</style>",
+        "</head>",
+        "<body>",
+        f"<h1>{title}</h1>",
+        "<table>",
+        "<tr><th>Day</th><th>Time</th><th>Class</th><th>Type</th></tr>"
+        ]
+    for meeting in sort_meetings(meetings):
+        row_class = "lect" if meeting.type == "LECT" else "else"
+        t_2 = format_time(meeting.start) + "-" + format_time(meeting.start + meeting.duration)
+        cells = [format_day(meeting.day), t_2, meeting.code + " " + meeting.num + " " + meeting.section, meeting_type(meeting, term_use)]
+        lines.append(f"<tr class=\"{row_class}\">" + "".join([f"<td>{html.escape(cell)}</td>" for cell in cells]) + "</tr>")
+    lines += ["</table>", "</body>", "</html>"]
+    return "\n".join(lines) + "\n"
+
+
+def ics_escape(text):
+    # Escape text for an iCalendar value
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def render_ics(location, term_use, meetings, template, DATA_CONFIG, FILENAME_OUTPUT):
+    # iCalendar file with one weekly event per meeting. The JSON file has no
+    # dates, so every event starts in the week of `ics_start` from the
+    # config file (this week if it is not set) and repeats `ics_weeks` times
+    import datetime
+    try:
+        week_start = datetime.date.fromisoformat(DATA_CONFIG["ics_start"]) if len(DATA_CONFIG["ics_start"]) > 0 else datetime.date.today()
+        num_weeks = int(DATA_CONFIG["ics_weeks"])
+    except ValueError:
+        print(f"{str_prefix_err} ics_start must be a date like 2022-09-07 and ics_weeks a number!")
+        sys.exit(1)
+    week_start -= datetime.timedelta(days=week_start.weekday()) # Monday
+    # DTSTAMP is required. It is the start of the week and not the current
+    # time so that the same data always makes the same file (batch mode
+    # skips rooms whose files did not change)
+    stamp = week_start.strftime("%Y%m%dT000000Z")
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//hussein-esmail7//yorku-scheduler//EN",
+        "CALSCALE:GREGORIAN",
+        "X-WR-CALNAME:" + ics_escape(f"Schedule for {location} for {term_use}")
+        ]
+    uids = {} # UID -> times it was used, only exact duplicates repeat
+    for meeting in sort_meetings(meetings):
+        if meeting.day not in DAYS:
+            continue
+        # The UID comes from the meeting itself, so adding or removing a
+        # meeting does not change the UIDs of the others
+        uid = hash_text(repr(meeting))[:16]
+        uids[uid] = uids.get(uid, 0) + 1
+        if uids[uid] > 1:
+            uid += f"-{uids[uid] - 1}"
+        t_start = datetime.datetime.combine(week_start, datetime.time()) + datetime.timedelta(days=DAYS.index(meeting.day), minutes=meeting.start)
+        t_end = t_start + datetime.timedelta(minutes=meeting.duration)
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{uid}@yorku-scheduler",
+            f"DTSTAMP:{stamp}",
+            "DTSTART:" + t_start.strftime("%Y%m%dT%H%M%S"),
+            "DTEND:" + t_end.strftime("%Y%m%dT%H%M%S"),
+            f"RRULE:FREQ=WEEKLY;COUNT={num_weeks}",
+            "SUMMARY:" + ics_escape(meeting.code + " " + meeting.num + " " + meeting.section + " " + meeting_type(meeting, term_use)),
+            "LOCATION:" + ics_escape(location),
+            "END:VEVENT"
+            ]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines) + "\r\n"
+
+
+def get_rooms_file(PATH_ROOMS):
+    # Read a list of rooms, one per line. Blank lines and lines starting with
+    # "#" are ignored
+    locations = []
+    for line in open(os.path.expanduser(PATH_ROOMS), "r").readlines():
+        line = line.strip().upper()
+        if len(line) > 0 and not line.startswith("#"):
+            locations.append(line)
+    return locations
+
+
+def index_key(PATH_JSON):
+    # What the index cache is valid for. If the JSON file is moved, replaced
+    # or edited, the key changes and the index is rebuilt
+    PATH_JSON = os.path.abspath(os.path.expanduser(PATH_JSON))
+    stat = os.stat(PATH_JSON)
+    return (PATH_JSON, stat.st_size, stat.st_mtime_ns)
+
+
+def build_index(DATA, BOOL_PRINTS=True):
+    # Location -> Term -> [(position, Meeting values), ...]
+    # `position` is where the meeting was in the room's list in the JSON, so
+    # that merging multiple terms keeps the original order. Rows are plain
+    # tuples so the index file does not depend on the Meeting class
+    index = {}
+    for location, meetings in group_meetings(DATA, BOOL_PRINTS).items():
+        index[location] = {}
+        for position, meeting in enumerate(meetings):
+            index[location].setdefault(meeting.term, []).append((position,) + tuple(meeting))
+    return index
+
+
+def read_index_header(PATH_INDEX, key):
+    # Header of an index file, or None if it is missing, can't be read, or is
+    # for a different JSON file. Index files use the same format as compiled
+    # datasets (see `write_dataset`), a JSON header and columns of numbers,
+    # so reading one never runs code from the file
+    if not os.path.exists(PATH_INDEX):
+        return None
+    header = load_dataset(PATH_INDEX)
+    if header is None or header["key"] != key:
+        return None
+    return header
+
+
+def load_index(PATH_JSON, BOOL_PRINTS=True):
+    # Index of the JSON file at `PATH_JSON`. In order, uses:
+    #   1. `PATH_JSON` itself if it is a standalone dataset (`convert -o`)
+    #   2. The index file next to the JSON file, if it is up to date
+    #   3. Parses the JSON, builds the index and writes the index file for
+    #      next time (`convert` does this step ahead of time)
+    # Returns the header dict, use `index_terms` and `index_slice` on it.
+    # Raises OSError or ValueError if the file can't be read (missing, half
+    # written, not JSON, ...), see `open_index`
+    if PATH_JSON.endswith(DATASET_SUFFIX):
+        header = load_dataset(os.path.expanduser(PATH_JSON))
+        if header is None:
+            raise ValueError(f"{PATH_JSON} is not a dataset this version can read! Run convert again")
+        if BOOL_PRINTS:
+            print(f"{str_prefix_info} Loaded compiled dataset")
+        return header
+    key = index_key(PATH_JSON)
+    PATH_INDEX = key[0] + INDEX_SUFFIX
+    header = read_index_header(PATH_INDEX, key)
+    if header is not None:
+        profile_add("Index", **{"Cache hits": 1})
+        if BOOL_PRINTS:
+            print(f"{str_prefix_info} Loaded index file")
+        return header
+    courses = iter_courses(key[0])
+    if PROFILE is not None:
+        courses = profile_iter("Index", "Courses scanned", courses)
+    index = build_index(courses, BOOL_PRINTS)
+    if BOOL_PRINTS:
+        print(f"{str_prefix_info} Loaded JSON file")
+    try:
+        write_dataset(PATH_INDEX, key, index)
+    except OSError:
+        # Read-only folder, etc. Still works, just not cached
+        if BOOL_PRINTS:
+            print(f"{str_prefix_err} Could not write index file to {PATH_INDEX}")
+    slices = {}
+    for location, terms in index.items():
+        for term in terms.keys():
+            slices[(location, term)] = None
+    # Keep the rows that were just built so they are not read back from disk
+    return {"key": key, "slices": slices, "index": index}
+
+
+def open_index(PATH_JSON, BOOL_PRINTS=True):
+    # `load_index` for the command line: exits with an error message instead
+    # of a traceback if the file can't be read
+    try:
+        return load_index(PATH_JSON, BOOL_PRINTS)
+    except (OSError, ValueError, KeyError, TypeError) as error:
+        fail(f"Could not read {PATH_JSON}: {error}")
+
+
+def index_locations(header):
+    # Every location in the index, sorted
+    return sorted(list(dict.fromkeys([location for location, term in header["slices"].keys()])))
+
+
+def index_terms(header, location):
+    # Sorted list of the terms that have meetings in `location`
+    return sorted([term for loc, term in header["slices"].keys() if loc == location])
+
+
+def index_slice(header, location, terms):
+    # Meetings in `location` for any of the terms in `terms`, in the same
+    # order as the JSON file. Only the slices for those terms are read
+    rows = []
+    for term in terms:
+        if (location, term) not in header["slices"]:
+            continue
+        if "index" in header:
+            rows += header["index"][location][term]
+        else:
+            rows += dataset_rows(header, *header["slices"][(location, term)])
+    rows.sort(key=lambda row: row[0])
+    return [Meeting._make(row[1:]) for row in rows]
+
+
+def write_dataset(PATH_DATASET, key, index):
+    # Compiled dataset file layout (little-endian):
+    #   DATASET_MAGIC, version (uint32), header length (uint32), JSON header,
+    #   then one array per column, each starting on a multiple of 8 bytes
+    # Rows are sorted by location and term, so every (location, term) slice
+    # is a range of rows. Text values are stored once in the header's
+    # "strings" list and the columns have their position in that list. Start
+    # times and durations are stored as numbers. Each column uses the
+    # smallest of uint8/uint16/uint32 that fits its values.
+    strings = {} # Text -> position in the strings list
+    columns = {"position": array.array("I")}
+    for field in Meeting._fields:
+        columns[field] = array.array("H" if field in DATASET_NUMBER_FIELDS else "I")
+    slices = []
+    for location in sorted(index.keys()):
+        for term in sorted(index[location].keys()):
+            row_start = len(columns["position"])
+            for row in index[location][term]:
+                columns["position"].append(row[0])
+                for field, value in zip(Meeting._fields, row[1:]):
+                    if field not in DATASET_NUMBER_FIELDS:
+                        value = strings.setdefault(value, len(strings))
+                    columns[field].append(value)
+            slices.append([strings.setdefault(location, len(strings)), strings.setdefault(term, len(strings)), row_start, len(columns["position"])])
+    for field, column in columns.items():
+        # Use the smallest type every value fits in
+        largest = max(column) if len(column) > 0 else 0
+        typecode = "B" if largest < 1 << 8 else "H" if largest < 1 << 16 else "I"
+        if typecode != column.typecode:
+            columns[field] = array.array(typecode, column)
+    header = {"source": list(key), "rows": len(columns["position"]), "strings": list(strings.keys()), "slices": slices, "columns": {}}
+    offset = 0 # From the start of the column data
+    for field, column in columns.items():
+        header["columns"][field] = [offset, column.typecode]
+        offset += -(-len(column) * column.itemsize // 8) * 8
+    text_header = json.dumps(header).encode()
+    # Written next to the dataset first and then moved over it, so a
+    # `convert` that is stopped halfway never leaves a broken dataset behind
+    PATH_TEMP = f"{PATH_DATASET}.{os.getpid()}.tmp"
+    try:
+        with open(PATH_TEMP, "wb") as f:
+            f.write(DATASET_MAGIC + DATASET_VERSION.to_bytes(4, "little") + len(text_header).to_bytes(4, "little") + text_header)
+            f.write(b"\0" * (-f.tell() % 8))
+            for column in columns.values():
+                if sys.byteorder == "big":
+                    column.byteswap()
+                f.write(column.tobytes())
+                f.write(b"\0" * (-f.tell() % 8))
+        os.replace(PATH_TEMP, PATH_DATASET)
+    except BaseException:
+        # Full disk, Ctrl+C, etc. Don't leave the half-written file behind
+        if os.path.exists(PATH_TEMP):
+            os.remove(PATH_TEMP)
+        raise
+
+
+def load_dataset(PATH_DATASET):
+    # Open a compiled dataset from `write_dataset`. The file is memory-mapped
+    # and only the header is read now, rows are read from the columns when a
+    # slice is asked for.
+    # Returns an index header (see `load_index`), or None if the file is not
+    # a dataset this version can read (empty, truncated, corrupt, etc.)
+    import mmap
+    try:
+        f = open(PATH_DATASET, "rb")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        f.close()
+        size_prefix = len(DATASET_MAGIC) + 8
+        if mm[:len(DATASET_MAGIC)] != DATASET_MAGIC or int.from_bytes(mm[len(DATASET_MAGIC):len(DATASET_MAGIC)+4], "little") != DATASET_VERSION:
+            return None
+        length_header = int.from_bytes(mm[size_prefix-4:size_prefix], "little")
+        header = json.loads(mm[size_prefix:size_prefix+length_header].decode())
+        start_data = -(-(size_prefix + length_header) // 8) * 8
+        if set(header["columns"].keys()) != {"position"} | set(Meeting._fields):
+            return None
+        columns = {}
+        for field, (offset, typecode) in header["columns"].items():
+            if typecode not in ("B", "H", "I"):
+                return None
+            itemsize = array.array(typecode).itemsize
+            if start_data + offset + header["rows"] * itemsize > len(mm):
+                # Truncated file, the column does not have a value for
+                # every row
+                return None
+            view = memoryview(mm)[start_data+offset:start_data+offset+header["rows"]*itemsize]
+            if sys.byteorder == "little":
+                columns[field] = view.cast(typecode) # No copy
+            else:
+                columns[field] = array.array(typecode, view.tobytes())
+                columns[field].byteswap()
+        strings = header["strings"]
+        slices = {}
+        for location, term, row_start, row_end in header["slices"]:
+            if not 0 <= row_start <= row_end <= header["rows"]:
+                return None
+            slices[(strings[location], strings[term])] = (row_start, row_end)
+        key = tuple(header["source"])
+    except (OSError, ValueError, KeyError, IndexError, TypeError):
+        # ValueError covers empty files (mmap), bad JSON and bad UTF-8
+        return None
+    return {"key": key, "slices": slices, "path": PATH_DATASET, "dataset": (columns, strings)}
+
+
+def dataset_rows(header, row_start, row_end):
+    # Rows of a compiled dataset, in the same format as the index file rows
+    columns, strings = header["dataset"]
+    column_position = columns["position"]
+    fields = [(columns[field], field in DATASET_NUMBER_FIELDS) for field in Meeting._fields]
+    rows = []
+    for row in range(row_start, row_end):
+        rows.append((column_position[row],) + tuple([column[row] if is_number else strings[column[row]] for column, is_number in fields]))
+    return rows
+
+
+def run_post_script(PATH_POST_SCRIPT, FILENAME_OUTPUT, BOOL_CAPTURE=True):
+    # Run the post-script on one output file and wait for it to finish. The
+    # command is split like a shell would, but is not run by a shell, so the
+    # file name is always passed as one argument and never run as a command.
+    # If `BOOL_CAPTURE` is False, what it prints goes straight to the terminal
+    # Returns (exit status, everything it printed)
+    import shlex
+    import subprocess
+    t_start = time.perf_counter()
+    try:
+        if BOOL_CAPTURE:
+            result = subprocess.run(shlex.split(PATH_POST_SCRIPT) + [FILENAME_OUTPUT], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+        else:
+            result = subprocess.run(shlex.split(PATH_POST_SCRIPT) + [FILENAME_OUTPUT])
+        status, output = result.returncode, result.stdout or ""
+    except (OSError, ValueError) as error:
+        # Command not found, unbalanced quotes, etc. 127 like a shell
+        status, output = 127, f"Could not run post-script: {error}"
+        if not BOOL_CAPTURE:
+            print(f"{str_prefix_err} {output}")
+    profile_add("Post-script", time.perf_counter() - t_start, Failed=int(status != 0))
+    return status, output
+
+
+def hash_text(text):
+    # Short content hash used by the batch mode manifest
+    import hashlib
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def read_manifest(DIR_OUTPUT):
+    # Rooms written by the last batch run into `DIR_OUTPUT`, {location: entry}
+    # See `build_room` for what an entry has. Empty if there is no manifest
+    PATH_MANIFEST = os.path.join(DIR_OUTPUT, MANIFEST_NAME)
+    if not os.path.exists(PATH_MANIFEST):
+        return {}
+    try:
+        manifest = json.load(open(PATH_MANIFEST, "r"))
+    except ValueError:
+        print(f"{str_prefix_err} Could not read {PATH_MANIFEST}, rebuilding everything")
+        return {}
+    if manifest.get("Version") != MANIFEST_VERSION:
+        return {}
+    return manifest["Rooms"]
+
+
+def write_manifest(DIR_OUTPUT, rooms):
+    PATH_MANIFEST = os.path.join(DIR_OUTPUT, MANIFEST_NAME)
+    json.dump({"Version": MANIFEST_VERSION, "Rooms": rooms}, open(PATH_MANIFEST, "w"), indent=4, sort_keys=True)
+
+
+def build_room(header, location, term_use, DIR_OUTPUT, template, DATA_CONFIG, PATH_POST_SCRIPT, previous=None, formats=["tex"]):
+    # Write the files of one room in every output format in `formats` and run
+    # the post-script on the `.tex` file. This is what every batch mode
+    # worker does.
+    # `previous` is the manifest entry of this room from the last run. Files
+    # that would be exactly the same as last time are not written again. The
+    # post-script is only run again if the `.tex` file changed, or it is a
+    # different post-script, or it failed last time.
+    # Returns a dict (which is also the room's new manifest entry):
+    # {
+    #   "Location" -> Building and room number
+    #   "File" -> Name of the `.tex` file (or the first format if there is no
+    #       `.tex` file), None if there was nothing to write
+    #   "Files" -> Names of every file
+    #   "Term" -> Semester that was used
+    #   "Meetings" -> Hash of the room's meetings in that semester
+    #   "Hashes" -> Name of every file -> hash of that file
+    # File names are relative to `DIR_OUTPUT` (where the manifest is), so the
+    # same folder given as a relative or absolute path has the same manifest
+    #   "Script" -> Post-script used on the files, "" if there is none
+    #   "Written" -> Names of the files that were written this time
+    #   "Skipped" -> True if nothing changed since the last run
+    #   "Ran" -> True if the post-script was run this time
+    #   "Status" -> Exit status of the post-script, None if it was not run
+    #   "Output" -> What the post-script printed
+    # }
+    result = {"Location": location, "File": None, "Files": [], "Term": term_use, "Meetings": "", "Hashes": {}, "Script": "", "Written": [], "Skipped": False, "Ran": False, "Status": None, "Output": ""}
+    if "tex" in formats:
+        # The post-script is only run on `.tex` files
+        result["Script"] = PATH_POST_SCRIPT
+    if result["Term"] == "":
+        # No semester was given. Same as a single run with only one
+        # option, use the first one found
+        result["Term"] = index_terms(header, location)[0]
+    meetings = index_slice(header, location, semesters_accepted(result["Term"]))
+    profile_add("Rooms", Meetings=len(meetings))
+    if len(meetings) == 0:
+        # Nothing in this room for the chosen semester
+        return result
+    result["Meetings"] = hash_text(repr((result["Term"], meetings)))
+    texts = {}
+    for format_output in formats:
+        extension, content_type, render = OUTPUT_FORMATS[format_output]
+        FILENAME_OUTPUT = room_filename(location, extension)
+        texts[FILENAME_OUTPUT] = render(location, result["Term"], meetings, template, DATA_CONFIG, FILENAME_OUTPUT)
+    result["Files"] = list(texts.keys())
+    result["File"] = room_filename(location) if "tex" in formats else result["Files"][0]
+    result["Hashes"] = {FILENAME_OUTPUT: hash_text(text_new) for FILENAME_OUTPUT, text_new in texts.items()}
+    hashes_previous = {} if previous is None else previous["Hashes"]
+    written = result["Written"]
+    for FILENAME_OUTPUT, text_new in texts.items():
+        PATH_OUTPUT = os.path.join(DIR_OUTPUT, FILENAME_OUTPUT)
+        if hashes_previous.get(FILENAME_OUTPUT) != result["Hashes"][FILENAME_OUTPUT] or not os.path.exists(PATH_OUTPUT):
+            open(PATH_OUTPUT, "w").write(text_new)
+            written.append(FILENAME_OUTPUT)
+    bool_run_script = len(result["Script"]) > 0 and (result["File"] in written or previous.get("Script") != result["Script"] or previous["Status"] != 0)
+    if len(written) == 0 and not bool_run_script:
+        # Same as last time, keep the last run's files and post-script result
+        result["Skipped"] = True
+        result["Status"] = previous["Status"]
+        return result
+    if bool_run_script:
+        result["Ran"] = True
+        result["Status"], result["Output"] = run_post_script(result["Script"], os.path.join(DIR_OUTPUT, result["File"]))
+    elif len(result["Script"]) > 0:
+        # Only other formats changed, the `.tex` file was already compiled
+        result["Status"] = previous["Status"]
+    return result
+
+
+def run_batch(header, locations, term_use, DIR_OUTPUT, template, DATA_CONFIG, PATH_POST_SCRIPT, BOOL_PRINTS, num_jobs=1, BOOL_FORCE=False, formats=["tex"]):
+    # Batch mode: write one file per room and output format from the index of
+    # the JSON data (see `load_index`). `locations` is a list of rooms, or
+    # None for every room. Rooms are written and post-scripts are run by a
+    # pool of `num_jobs` workers at the same time.
+    # A manifest in `DIR_OUTPUT` remembers what every room looked like, so
+    # rooms that did not change are skipped (unless `BOOL_FORCE`), and the
+    # rooms that were added, changed or removed since last time are listed.
+    # Never asks the user anything, existing files in `DIR_OUTPUT` are
+    # overwritten.
+    # Returns (number of files written, number of post-scripts that failed)
+    import concurrent.futures
+    rooms = index_locations(header)
+    if locations is not None:
+        for location in locations:
+            if location not in rooms:
+                print(f"{str_prefix_err} No items found for '{location}'")
+        rooms = [location for location in rooms if location in set(locations)]
+    if BOOL_PRINTS:
+        print(f"{str_prefix_info} {len(rooms)} rooms found")
+    DIR_OUTPUT = os.path.expanduser(DIR_OUTPUT)
+    if not os.path.exists(DIR_OUTPUT):
+        os.makedirs(DIR_OUTPUT)
+    manifest = read_manifest(DIR_OUTPUT)
+    results = []
+    # Threads are enough here: the slow part is the post-script, which runs
+    # in its own process
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_jobs) as pool:
+        futures = [pool.submit(build_room, header, location, term_use, DIR_OUTPUT, template, DATA_CONFIG, PATH_POST_SCRIPT, None if BOOL_FORCE else manifest.get(location), formats) for location in rooms]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            if result["File"] is None:
+                continue
+            results.append(result)
+            if BOOL_PRINTS:
+                for FILENAME_OUTPUT in result["Written"]:
+                    print(f"{str_prefix_done} Wrote to '{os.path.join(DIR_OUTPUT, FILENAME_OUTPUT)}'")
+            if result["Ran"] and result["Status"] != 0:
+                print(f"{str_prefix_err} Post-script failed for '{os.path.join(DIR_OUTPUT, result['File'])}' (exit status {result['Status']})")
+    results.sort(key=lambda result: result["Location"])
+
+    # Compare with the last run. Rooms that were not asked for this time are
+    # kept in the manifest as they were
+    rooms_new = {}
+    for result in results:
+        rooms_new[result["Location"]] = {"File": result["File"], "Files": result["Files"], "Term": result["Term"], "Meetings": result["Meetings"], "Hashes": result["Hashes"], "Script": result["Script"], "Status": result["Status"]}
+    added = [location for location in rooms_new.keys() if location not in manifest]
+    changed = [location for location in rooms_new.keys() if location in manifest and manifest[location]["Meetings"] != rooms_new[location]["Meetings"]]
+    removed = sorted([location for location in manifest.keys() if location not in rooms_new and (locations is None or location in locations)])
+    for location, entry in manifest.items():
+        if location not in rooms_new and location not in removed:
+            rooms_new[location] = entry
+    write_manifest(DIR_OUTPUT, rooms_new)
+
+    # Summary
+    # Rooms where only the post-script ran again (it changed, or failed last
+    # time) are not unchanged, but no files were written for them
+    written = [FILENAME_OUTPUT for result in results for FILENAME_OUTPUT in result["Written"]]
+    ran = [result for result in results if result["Ran"]]
+    failed = [result for result in ran if result["Status"] != 0]
+    if BOOL_PRINTS:
+        print(f"{str_prefix_info} {len([result for result in results if result['Skipped']])} rooms unchanged since the last run")
+        for title, rooms_list in [("Added", added), ("Changed", changed), ("Removed", removed)]:
+            if len(rooms_list) > 0:
+                print(f"\t{title} ({len(rooms_list)}): {', '.join(rooms_list)}")
+    if len(PATH_POST_SCRIPT) > 0 and (BOOL_PRINTS or len(failed) > 0):
+        print(f"{str_prefix_info} Post-script: {len(ran) - len(failed)} succeeded, {len(failed)} failed")
+        for result in failed:
+            print(f"\t{result['Location']} ({os.path.join(DIR_OUTPUT, result['File'])}), exit status {result['Status']}:")
+            for line in result["Output"].splitlines():
+                print(f"\t\t{line}")
+    return len(written), len(failed)
+
+
+def normalize_day(day):
+    # "th", "R", "r" -> "R". Returns "" if it is not a day
+    day = day.strip().upper()
+    if day == "TH":
+        day = "R"
+    if len(day) == 1 and day in DAYS:
+        return day
+    return ""
+
+
+def build_availability(header, term_use):
+    # When every room is booked in a semester, as minute bitmaps:
+    #   {location: {day: bitmap}}
+    # Bit `m` of a bitmap is set if the room is booked during minute `m` of
+    # that day (minute 0 is 0:00). Checking a time range of a room is then
+    # one AND, so a query over every room on campus takes well under a
+    # millisecond. Rooms with no meetings in this semester have no days
+    availability = {}
+    for location in index_locations(header):
+        days = {}
+        for meeting in index_slice(header, location, semesters_accepted(term_use)):
+            days[meeting.day] = days.get(meeting.day, 0) | minutes_mask(meeting.start, meeting.start + meeting.duration)
+        availability[location] = days
+    return availability
+
+
+def minutes_mask(start, end):
+    # Bitmap with the minutes from `start` up to (not including) `end` set
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
+
+
+def find_free_rooms(availability, day, start, end, building=""):
+    # Rooms (optionally only in `building`) with nothing booked on `day`
+    # between `start` and `end` (minutes since midnight), sorted
+    mask = minutes_mask(start, end)
+    prefix = building.strip().upper() + " "
+    return [location for location, days in sorted(availability.items())
+            if days.get(day, 0) & mask == 0 and (prefix == " " or location.startswith(prefix))]
+
+
+def find_free_slots(availability, location, day, start=DAY_START, end=DAY_END, min_length=1):
+    # Free time ranges of a room on `day` between `start` and `end`, as a
+    # list of (start, end) in minutes. Ranges shorter than `min_length`
+    # minutes are left out
+    booked = (availability.get(location, {}).get(day, 0) >> start) & ((1 << (end - start)) - 1)
+    slots = []
+    pos = 0
+    while pos < end - start:
+        # Skip to the next free minute, then to the next booked one
+        free = ~(booked >> pos)
+        pos += (free & -free).bit_length() - 1
+        if pos >= end - start:
+            break
+        rest = booked >> pos
+        length = (rest & -rest).bit_length() - 1 if rest != 0 else end - start - pos
+        length = min(length, end - start - pos)
+        if length >= min_length:
+            slots.append((start + pos, start + pos + length))
+        pos += length
+    return slots
+
+
+def main_free(args):
+    # `free` subcommand: which rooms are free at a time, or when a room is
+    # free. `args` are the arguments after "free"
+    PATH_JSON = ""
+    term_use = ""
+    building = ""
+    location = ""
+    day = ""
+    start = DAY_START
+    end = DAY_END
+    min_length = 1
+    BOOL_PRINTS = True
+    for arg_num, arg in enumerate(args):
+        # Value after the flag, "" if the flag is the last argument, which
+        # then gets the same error as any other bad value
+        value = args[arg_num+1] if arg_num+1 < len(args) else ""
+        if arg == "-h" or arg == "--help":
+            print("--- yorku-scheduler.py free ---")
+            print("Find free rooms, or free times of a room.")
+            print()
+            print("Arguments:")
+            print("\t-h, --help\tHelp message and exit program.")
+            print("\t-j, --json\tInput the JSON path as a string.")
+            print("\t-s, --sem, --semester\n\t\t\tInput the semester you want as a string.")
+            print("\t-b, --building\tOnly show rooms in this building.")
+            print("\t-r, --room\tShow the free times of this room instead.")
+            print("\t--day\t\tDay of the week (M, T, W, R/Th, F). All days if\n\t\t\tnot given with -r.")
+            print("\t--from\t\tStart of the time range (\"14:00\").")
+            print("\t--to\t\tEnd of the time range (\"16:00\").")
+            print("\t--min\t\tShortest free time to show with -r, in minutes.")
+            print("\t-q, --quiet\tQuiet mode. Only display the results.")
+            sys.exit()
+        elif arg == "-j" or arg == "--json":
+            PATH_JSON = os.path.expanduser(value)
+        elif arg == "-s" or arg == "--sem" or arg == "--semester":
+            term_use = valid_sem(value)
+        elif arg == "-b" or arg == "--building":
+            building = value.strip().upper()
+        elif arg == "-r" or arg == "--room":
+            location = value.strip().upper()
+        elif arg == "--day":
+            day = normalize_day(value)
+            if day == "":
+                print(f"{str_prefix_err} Day must be one of M, T, W, R (or Th), F, S, U!")
+                sys.exit(1)
+        elif arg == "--from" or arg == "--to":
+            try:
+                minutes = parse_time(value)
+                if not 0 <= int(value.split(":")[1]) < 60 or not 0 <= minutes <= 24 * 60:
+                    raise ValueError
+            except ValueError:
+                print(f"{str_prefix_err} Times must be like 14:00, from 0:00 to 24:00!")
+                sys.exit(1)
+            if arg == "--from":
+                start = minutes
+            else:
+                end = minutes
+        elif arg == "--min":
+            try:
+                min_length = int(value)
+            except ValueError:
+                min_length = 0
+            if min_length < 1:
+                print(f"{str_prefix_err} --min must be a number of minutes, 1 or more!")
+                sys.exit(1)
+        elif arg == "-q" or arg == "--quiet":
+            BOOL_PRINTS = False
+    if not os.path.exists(PATH_JSON):
+        print(f"{str_prefix_err} JSON file not found!")
+        sys.exit(1)
+    if term_use == "":
+        print(f"{str_prefix_err} A semester must be given (-s)!")
+        sys.exit(1)
+    if end <= start:
+        print(f"{str_prefix_err} The end time must be after the start time!")
+        sys.exit(1)
+    availability = build_availability(open_index(PATH_JSON, BOOL_PRINTS), term_use)
+    if len(location) > 0:
+        # When is this room free?
+        if location not in availability:
+            print(f"{str_prefix_err} No items found for '{location}'")
+            sys.exit(1)
+        for day_use in (day if day != "" else DAYS[:5]):
+            slots = find_free_slots(availability, location, day_use, start, end, min_length)
+            print(f"{format_day(day_use)}: " + ", ".join([format_time(slot[0]) + "-" + (format_time(slot[1]) if slot[1] < 24 * 60 else "24:00") for slot in slots]))
+        sys.exit()
+    # Which rooms are free?
+    if day == "":
+        print(f"{str_prefix_err} A day must be given (--day)!")
+        sys.exit(1)
+    rooms = find_free_rooms(availability, day, start, end, building)
+    if BOOL_PRINTS:
+        print(f"{str_prefix_info} {len(rooms)} rooms free on {day} {format_time(start)}-{format_time(end) if end < 24 * 60 else '24:00'} in {term_use}:")
+    for location in rooms:
+        print(location)
+    sys.exit()
+
+
+def main_convert(args):
+    # `convert` subcommand: build the index file of a JSON file ahead of
+    # time, or with `-o`, a standalone dataset that works without the JSON.
+    # `args` are the arguments after "convert"
+    PATH_JSON = ""
+    PATH_DATASET = ""
+    BOOL_PRINTS = True
+    for arg_num, arg in enumerate(args):
+        value = args[arg_num+1] if arg_num+1 < len(args) else "" # See `main_free`
+        if arg == "-h" or arg == "--help":
+            print("--- yorku-scheduler.py convert ---")
+            print("Build the index file of a JSON file now, instead of on the first run")
+            print("that uses it. With -o, write a standalone dataset that can be given")
+            print("to -j instead of the JSON file.")
+            print()
+            print("Arguments:")
+            print("\t-h, --help\tHelp message and exit program.")
+            print("\t-j, --json\tInput the JSON path as a string.")
+            print(f"\t-o, --output\tStandalone dataset file to write (\"{DATASET_SUFFIX}\" is\n\t\t\tadded if missing). Default is the index file.")
+            print("\t-q, --quiet\tQuiet mode. Only display text when required.")
+            sys.exit()
+        elif arg == "-j" or arg == "--json":
+            PATH_JSON = os.path.expanduser(value)
+        elif arg == "-o" or arg == "--output":
+            PATH_DATASET = os.path.expanduser(value)
+        elif arg == "-q" or arg == "--quiet":
+            BOOL_PRINTS = False
+    if not os.path.exists(PATH_JSON) or PATH_JSON.endswith(DATASET_SUFFIX):
+        print(f"{str_prefix_err} JSON file not found!")
+        sys.exit(1)
+    key = index_key(PATH_JSON)
+    if len(PATH_DATASET) == 0:
+        PATH_DATASET = key[0] + INDEX_SUFFIX
+    elif not PATH_DATASET.endswith(DATASET_SUFFIX):
+        # So `load_index` knows it is a dataset when it is given to -j
+        PATH_DATASET += DATASET_SUFFIX
+    write_dataset(PATH_DATASET, key, build_index(iter_courses(key[0]), BOOL_PRINTS))
+    if BOOL_PRINTS:
+        print(f"{str_prefix_done} Wrote to '{PATH_DATASET}'")
+    sys.exit()
+
+
+def index_load_all(header):
+    # Read every slice of the index into memory, so later `index_slice`
+    # calls do not touch the disk. Used by the server
+    if "index" in header:
+        return header
+    index = {}
+    for (location, term), (row_start, row_end) in header["slices"].items():
+        index.setdefault(location, {})[term] = dataset_rows(header, row_start, row_end)
+    header["index"] = index
+    return header
+
+
+def server_refresh(state):
+    # Reload the index if the JSON file changed and recompile the template if
+    # it changed. Either one clears the cache of rendered schedules.
+    # If the JSON file is missing or can't be read (like while the scraper is
+    # writing it), the last good data keeps being served.
+    # Returns (index header, template, generation)
+    with state["lock"]:
+        key = None
+        try:
+            key = index_key(state["PATH_JSON"])
+            if key != state["key"] and (state["json_error"] is None or state["json_error"][0] != key):
+                if state["key"] is not None and state["BOOL_PRINTS"]:
+                    print(f"{str_prefix_info} JSON file changed, reloading")
+                header = index_load_all(load_index(state["PATH_JSON"], state["BOOL_PRINTS"]))
+                state["header"] = header
+                state["key"] = key # Only once the reload worked
+                state["json_error"] = None
+                state["generation"] += 1
+                state["cache"].clear()
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            # Remember the key it failed for so the same broken file is not
+            # parsed again on every request (None if the file is missing)
+            if state["json_error"] is None or state["json_error"][1] != str(error):
+                print(f"{str_prefix_err} Could not read {state['PATH_JSON']}: {error}")
+            state["json_error"] = (key, str(error))
+        if os.path.exists(state["PATH_TEMPLATE"]):
+            # If the template was deleted, keep using the last one
+            mtime = os.stat(state["PATH_TEMPLATE"]).st_mtime_ns
+            if state["template_error"] is None or state["template_error"][0] != mtime:
+                try:
+                    template = compile_template(state["PATH_TEMPLATE"])
+                    state["template_error"] = None
+                    if template is not state["template"]:
+                        state["template"] = template
+                        state["generation"] += 1
+                        state["cache"].clear()
+                except ValueError as error:
+                    # Broken template. Everything but `.tex` files keeps
+                    # working until it is fixed
+                    print(f"{str_prefix_err} {error}")
+                    state["template_error"] = (mtime, str(error))
+        return state["header"], state["template"], state["generation"]
+
+
+def server_schedule(state, location, term_use, format_output):
+    # Schedule of one room in `format_output` (or JSON), from the cache if it
+    # was asked for before. Returns None if the room has no meetings. Raises
+    # ValueError for `.tex` files while the template is broken
+    header, template, generation = server_refresh(state)
+    if format_output == "tex" and state["template_error"] is not None:
+        raise ValueError(state["template_error"][1])
+    key_cache = (generation, location, term_use, format_output)
+    with state["lock"]:
+        if key_cache in state["cache"]:
+            state["cache"].move_to_end(key_cache) # Most recently used
+            return state["cache"][key_cache]
+    terms = index_terms(header, location)
+    if len(terms) == 0:
+        return None
+    if term_use == "":
+        # Same as batch mode, use the first semester found
+        term_use = terms[0]
+    meetings = index_slice(header, location, semesters_accepted(term_use))
+    if format_output == "json":
+        schedule = []
+        for meeting in meetings:
+            item = meeting._asdict()
+            item["time"] = format_time(meeting.start) + "-" + format_time(meeting.start + meeting.duration)
+            schedule.append(item)
+        body = json.dumps({"location": location, "term": term_use, "meetings": schedule})
+    else:
+        extension, content_type, render = OUTPUT_FORMATS[format_output]
+        body = render(location, term_use, meetings, template, state["DATA_CONFIG"], room_filename(location, extension))
+    with state["lock"]:
+        state["cache"][key_cache] = body
+        if len(state["cache"]) > SERVER_CACHE_SIZE:
+            state["cache"].popitem(last=False) # Least recently used
+    return body
+
+
+class ScheduleRequestHandler:
+    # Requests to the --serve server (mixed into
+    # http.server.BaseHTTPRequestHandler by `serve`):
+    #   GET /rooms -> JSON list of every room
+    #   GET /terms?room=CLH+I -> JSON list of semesters in a room
+    #   GET /schedule?room=CLH+I&sem=F&format=tex -> `.tex` file of a room
+    #   GET /schedule?room=CLH+I&sem=F&format=json -> Meetings as JSON
+    #   GET /schedule?room=CLH+I&sem=F&format=ics -> Also csv and html
+    # `sem` is optional, the first semester in the room is used without it.
+
+    def send_body(self, status, content_type, body):
+        body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type + "; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        import urllib.parse
+        state = self.server.state
+        url = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        location = query.get("room", [""])[0].strip().upper()
+        if url.path == "/rooms":
+            header = server_refresh(state)[0]
+            self.send_body(200, "application/json", json.dumps(index_locations(header)))
+        elif url.path == "/terms":
+            header = server_refresh(state)[0]
+            self.send_body(200, "application/json", json.dumps(index_terms(header, location)))
+        elif url.path == "/schedule":
+            term_use = query.get("sem", [""])[0].strip().upper()
+            format_output = query.get("format", ["tex"])[0]
+            if len(location) == 0:
+                self.send_body(400, "text/plain", "Missing room\n")
+            elif term_use != valid_sem(term_use):
+                self.send_body(400, "text/plain", f"Invalid semester '{term_use}'\n")
+            elif format_output not in OUTPUT_FORMATS and format_output != "json":
+                self.send_body(400, "text/plain", f"Invalid format '{format_output}'\n")
+            else:
+                try:
+                    body = server_schedule(state, location, term_use, format_output)
+                except ValueError as error:
+                    self.send_body(500, "text/plain", f"{error}\n")
+                    return
+                if body is None:
+                    self.send_body(404, "text/plain", f"No items found for '{location}'\n")
+                elif format_output == "json":
+                    self.send_body(200, "application/json", body)
+                else:
+                    self.send_body(200, OUTPUT_FORMATS[format_output][1], body)
+        else:
+            self.send_body(404, "text/plain", "Not found\n")
+
+    def log_message(self, format, *args):
+        if self.server.state["BOOL_PRINTS"]:
+            super().log_message(format, *args)
+
+
+def serve(PATH_JSON, port, PATH_TEMPLATE, DATA_CONFIG, BOOL_PRINTS):
+    # Server mode: load the JSON file and template once and answer requests
+    # (see ScheduleRequestHandler) until stopped with Ctrl+C. Only listens on
+    # this computer
+    import http.server
+    state = {
+        "PATH_JSON": PATH_JSON,
+        "PATH_TEMPLATE": PATH_TEMPLATE,
+        "DATA_CONFIG": DATA_CONFIG,
+        "BOOL_PRINTS": BOOL_PRINTS,
+        "key": None, # Index key of the loaded JSON file
+        "header": None,
+        "template": None,
+        "template_error": None, # (mtime, message) while the template is broken
+        "json_error": None, # (key, message) while the JSON file is broken
+        "generation": 0, # Goes up every time the JSON or template changes
+        "cache": collections.OrderedDict(), # Rendered schedules, LRU order
+        "lock": threading.Lock()
+        }
+    server_refresh(state)
+    if state["header"] is None:
+        # Nothing good to fall back to yet
+        sys.exit(1)
+    handler = type("ScheduleRequestHandler", (ScheduleRequestHandler, http.server.BaseHTTPRequestHandler), {})
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.state = state
+    if BOOL_PRINTS:
+        print(f"{str_prefix_info} Serving on http://127.0.0.1:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
 def main():
     # ========= VARIABLES ===========
     BOOL_PRINTS     = True
+    BOOL_STRICT     = False # True to never ask questions (--strict)
+    BOOL_ALL_ROOMS  = False # True when every room should get a `.tex` file
     term_use = "" # Semester choice if there are multiple options
     confirmed_filename = False # True when a safe file name has been set
     bool_location_confirmed = False # True when a building and room is set
+    location = "" # Building and room number
     FILENAME_OUTPUT = "test.tex" # LaTeX file name. User changes this later
+    DIR_OUTPUT = "." # Folder batch mode writes its `.tex` files to
+    num_jobs = 1 # Number of rooms batch mode works on at the same time
+    BOOL_FORCE = False # True to rebuild rooms in batch mode that didn't change
     PATH_JSON = "" # Path of JSON file will be here
-    index_insert = -1 # Index where to put schedule lines in the template file
-    index_classes_insert = -1 # Index where to put class list in the template file
-    #   The above variable is useful because if there's 0 queries, there's no
-    #   point of making a `.tex` file.
-    arr_latex_newlines = [] # Lines to insert into the LaTeX file will go here
-
-
-    # GET CONFIGURATIONS FROM CONFIGURATION FILE
-    DATA_CONFIG = get_config(PATH_CONFIG)
-    PATH_TEMPLATE = DATA_CONFIG["path_template"]
-    PATH_POST_SCRIPT     = os.path.expanduser(DATA_CONFIG["path_post_script"])
+    PATH_ROOMS = "" # Path of a file with one room per line (batch mode)
+    format_profile = "" # "table" or "json" when --profile is used
+    port = -1 # Port to serve on in server mode, -1 when not in server mode
+    term_invalid = "" # Semester given with -s that is not valid
+    formats = ["tex"] # Output formats to write (see OUTPUT_FORMATS)
+    #   If there's 0 meetings, there's no point of making a `.tex` file.
 
     # USER ARGUMENT PARSING
     args = sys.argv
+    if len(args) > 1 and args[1] in SUBCOMMANDS:
+        # Subcommands have their own arguments
+        SUBCOMMANDS[args[1]](args[2:])
     if len(args) > 1:
         # args[0] = file name, ignore this
         for arg_num, arg in enumerate(args[1:]):
@@ -168,6 +1553,10 @@ def main():
                 print("--- yorku-scheduler.py ---")
                 print("https://github.com/hussein-esmail7/yorku-scheduler")
                 print()
+                print("Subcommands (see \"<subcommand> --help\"):")
+                print("\tconvert\t\tCompile a JSON file into a dataset that loads faster.")
+                print("\tfree\t\tFind free rooms, or free times of a room.")
+                print()
                 print("Arguments:")
                 print("\t-h, --help\tHelp message and exit program.")
                 print("\t-j, --json\tInput the JSON path as a string.")
@@ -175,14 +1564,22 @@ def main():
                 print("\t-r, --room\tInput the room as a string.")
                 print("\t-s, --sem, --semester\n\t\t\tInput the semester you want as a string.")
                 print("\t-q, --quiet\tQuiet mode. Only display text when required.")
+                print("\t--strict\tNever ask questions. Exit with an error instead of asking.\n\t\t\tExit status: 1 bad argument or file, 2 missing answer,\n\t\t\t3 no items found, 4 batch post-script failed.")
+                print("\t-a, --all-rooms\tBatch mode. Make a `.tex` file for every room.")
+                print("\t-f, --rooms-file\n\t\t\tBatch mode. Make a `.tex` file for every room in this file.")
+                print("\t-d, --output-dir\n\t\t\tFolder to write batch mode `.tex` files to.")
+                print("\t-J, --jobs\tNumber of rooms batch mode works on at once.\n\t\t\t0 uses every CPU core.")
+                print("\t--format\tOutput formats, separated by commas (tex, csv, html, ics).\n\t\t\tDefault is tex.")
+                print("\t--force\t\tBatch mode. Rebuild rooms even if they did not change.")
+                print("\t--serve\t\tServer mode. Answer schedule requests over HTTP.\n\t\t\tPort number can be given after it (default 8080).")
+                print("\t--profile\tPrint time, counts and peak memory of every stage.\n\t\t\tAdd \"json\" after it for a JSON report.")
                 sys.exit()
             elif arg == "-j" or arg == "--json":
                 # User inputs the JSON location in the next arg
                 PATH_JSON = args[arg_num+2]
                 if not os.path.exists(os.path.expanduser(PATH_JSON)):
-                    # If JSON not found, reset the variable to ask again later
+                    # If JSON not found, it is asked for again later
                     print(f"{str_prefix_err} JSON file not found!")
-                    PATH_JSON = ""
             elif arg == "-o" or arg == "--output": # .tex file name
                 FILENAME_OUTPUT = args[arg_num+2]
             elif arg == "-r" or arg == "--room":
@@ -196,21 +1593,98 @@ def main():
             elif arg == "-s" or arg == "--sem" or arg == "--semester":
                 # User inputs the semester they want in the next arg
                 term_use = valid_sem(args[arg_num+2])
+                if term_use == "":
+                    term_invalid = args[arg_num+2] # --strict fails on this
             elif arg == "-q" or arg == "--quiet":
                 BOOL_PRINTS = False
-    # Check the template file location is correct before asking user questions
-    if not os.path.exists(PATH_TEMPLATE):
-        print(f"{str_prefix_err} Template file does not exist at location!")
-        sys.exit(1)
-    lines_template = open(PATH_TEMPLATE, "r").readlines()
-    for line_num, line in enumerate(lines_template):
-        if LINE_INSERT in line:
-            index_insert = line_num
-        if LINE_CLASSES_INSERT in line:
-            index_class_insert = line_num
-    if index_insert == -1:
-        print(f"{str_prefix_err} No insert line in template file! Expected: '{LINE_INSERT}'")
+            elif arg == "--strict":
+                BOOL_STRICT = True
+            elif arg == "-a" or arg == "--all-rooms":
+                BOOL_ALL_ROOMS = True
+            elif arg == "-f" or arg == "--rooms-file":
+                # User inputs a file of rooms in the next arg
+                PATH_ROOMS = args[arg_num+2]
+                if not os.path.exists(os.path.expanduser(PATH_ROOMS)):
+                    print(f"{str_prefix_err} Rooms file not found!")
+                    sys.exit(1)
+            elif arg == "-d" or arg == "--output-dir":
+                DIR_OUTPUT = args[arg_num+2]
+            elif arg == "--force":
+                BOOL_FORCE = True
+            elif arg == "--format":
+                # User inputs the output formats in the next arg. Ex. "tex,ics"
+                formats = [format_output.strip().lower() for format_output in args[arg_num+2].split(",") if len(format_output.strip()) > 0]
+                for format_output in formats:
+                    if format_output not in OUTPUT_FORMATS:
+                        print(f"{str_prefix_err} Unknown format '{format_output}'! Use {', '.join(OUTPUT_FORMATS.keys())}")
+                        sys.exit(1)
+                if len(formats) == 0:
+                    print(f"{str_prefix_err} At least 1 format is needed!")
+                    sys.exit(1)
+            elif arg == "--serve":
+                port = SERVER_PORT
+                if arg_num+2 < len(args) and args[arg_num+2].isdigit():
+                    port = int(args[arg_num+2])
+            elif arg == "--profile":
+                format_profile = "table"
+                if arg_num+2 < len(args) and args[arg_num+2] in ("table", "json"):
+                    format_profile = args[arg_num+2]
+            elif arg == "-J" or arg == "--jobs":
+                try:
+                    num_jobs = int(args[arg_num+2])
+                except ValueError:
+                    num_jobs = -1
+                if num_jobs < 0:
+                    print(f"{str_prefix_err} Number of jobs must be a number, 0 or more!")
+                    sys.exit(1)
+                if num_jobs == 0:
+                    num_jobs = os.cpu_count() or 1
+    if BOOL_STRICT and len(term_invalid) > 0:
+        fail(f"Invalid semester '{term_invalid}'! Use Y, F, W, SU, S1 or S2", EXIT_ERROR)
+    if len(format_profile) > 0:
+        profile_start()
+        atexit.register(print_profile, format_profile) # Print at any exit
+
+    if port != -1:
+        # Server mode. Never asks the user anything, so the JSON must be given
+        if not os.path.exists(os.path.expanduser(PATH_JSON)):
+            print(f"{str_prefix_err} Server mode needs a valid JSON file (-j)!")
+            sys.exit(1)
+        DATA_CONFIG, template = load_settings(list(OUTPUT_FORMATS), not BOOL_STRICT)
+        serve(PATH_JSON, port, DATA_CONFIG["path_template"], DATA_CONFIG, BOOL_PRINTS)
         sys.exit()
+    if BOOL_ALL_ROOMS or len(PATH_ROOMS) > 0:
+        # Batch mode. Never asks the user anything, so the JSON must be given
+        if not os.path.exists(os.path.expanduser(PATH_JSON)):
+            print(f"{str_prefix_err} Batch mode needs a valid JSON file (-j)!")
+            sys.exit(1)
+        locations = None # Every room
+        if len(PATH_ROOMS) > 0:
+            locations = get_rooms_file(PATH_ROOMS)
+        DATA_CONFIG, template = load_settings(formats, not BOOL_STRICT)
+        with profile_stage("Index"):
+            header = open_index(PATH_JSON, BOOL_PRINTS)
+        with profile_stage("Rooms"):
+            count_written, count_failed = run_batch(header, locations, term_use, DIR_OUTPUT, template, DATA_CONFIG, DATA_CONFIG["path_post_script"], BOOL_PRINTS, num_jobs, BOOL_FORCE, formats)
+        profile_add("Rooms", Written=count_written)
+        if BOOL_PRINTS:
+            print(f"{str_prefix_done} {count_written} files written")
+        if count_failed > 0:
+            # So scripts and build boxes see that a post-script failed
+            sys.exit(EXIT_POST_SCRIPT)
+        sys.exit()
+    if BOOL_STRICT:
+        # Everything that would be asked has to be given as an argument. The
+        # config file and template are only read once there is something to
+        # write
+        if not os.path.exists(os.path.expanduser(PATH_JSON)):
+            fail("--strict needs a valid JSON file (-j)!", EXIT_MISSING if PATH_JSON == "" else EXIT_ERROR)
+        if not bool_location_confirmed:
+            fail("--strict needs a building and room (-r)!", EXIT_MISSING if location == "" else EXIT_ERROR)
+        DATA_CONFIG = None
+    else:
+        # Check the template file location is correct before asking user questions
+        DATA_CONFIG, template = load_settings(formats)
     # Ask for JSON file path
     while not os.path.exists(os.path.expanduser(PATH_JSON)):
         # Keep asking for a path until it gets a valid one
@@ -218,11 +1692,8 @@ def main():
         if PATH_JSON.lower() == "exit" or PATH_JSON.lower() == "quit":
             # If the user types "quit" or "exit" instead of an actual file path
             sys.exit()
-    f = open(PATH_JSON)
-    DATA = json.load(f)
-    f.close()
-    if BOOL_PRINTS:
-        print(f"{str_prefix_info} Loaded JSON file")
+    with profile_stage("Index"):
+        header = open_index(PATH_JSON, BOOL_PRINTS)
     # Ask the user for the building and room
     while not bool_location_confirmed:
         location = input(f"{str_prefix_q} Input the building and room number: ")
@@ -234,177 +1705,108 @@ def main():
         else:
             bool_location_confirmed = yes_or_no(f"Is '{location}' correct? ")
 
-    # Iterate the JSON and return the matching items
-    queries = [] # Semesters of the returned queries. Only matters if found more than 1 type
-    # Dict format of `queries`:
-    # {
-    #   "Department" -> LE, AP, GS, ...
-    #   "Code" -> EECS/ADMS/EN/ENG/...
-    #   "Num" -> 1000, 1001, 2001, etc.
-    #   "Section" -> A, B, C, ...
-    #   "Type" -> LECT, TUTR, SEMR, LAB, ...
-    #   "Day" -> MTWRF
-    #   "Duration" -> String of a number in minutes
-    #   "Time" -> 14:00, 9:30, ...
-    #   "Location" -> Building and room number
-    #   "Term" -> F, W, SU, S1, S2, etc.
-    # }
-    terms = []
-    for course in DATA:
-        # For every course
-        for meeting in course["Meetings"]:
-            # For all meetings in the course
-            if meeting["Location"] == location:
-                # If this item is in that room, add it to `queries`
-                # The reason this is not processed into the file is
-                # because there may be multiple terms in the JSON file.
-                # Even an SU vs S1 could be an issue (especially if
-                # there's an S2 course at the same time)
-                num = ""
-                if type != "LECT" and type != "SEMR": # Error handling
-                    # Since LECT and SEMR doesn't have this value
-                    num = meeting["Num"]
-                terms.append(course["Term"])
-                queries.append({
-                        "Department": course["Department"],
-                        "Code": course["Code"],
-                        "Num": course["Num"], # 1000, 2030, etc.
-                        # "Year": section["Year"], # Actual year # TODO
-                        "Section": meeting["Section"],
-                        "Type": meeting["Type"],
-                        "Num2": meeting["Num"], # The 02 in TUTR 02
-                        "Day": meeting["Day"],
-                        "Duration": meeting["Duration"],
-                        "Time": meeting["Time"],
-                        "Location": meeting["Location"],
-                        "Term": course["Term"]
-                    })
-    terms = sorted(list(dict.fromkeys(terms))) # Remove duplicates
-    if len(terms) > 1 and term_use == "":
+    # Semesters that have items in this room. Only matters if found more than 1 type
+    terms = index_terms(header, location)
+    if len(terms) == 0 and BOOL_STRICT:
+        fail(f"No items found for '{location}'", EXIT_NO_ITEMS)
+    elif len(terms) > 1 and term_use == "" and BOOL_STRICT:
+        fail(f"'{location}' has {len(terms)} semesters ({', '.join(terms)}), pick one with -s!", EXIT_MISSING)
+    elif len(terms) > 1 and term_use == "":
         # If a term has not been specified and requires specification
         print(f"{str_prefix_info} {len(terms)} semester options:")
         for term_num, term in enumerate(terms):
             print(f"\t{term_num+1}. {term}")
         term_use = terms[ask_int(f"Which semester do you want to use?")-1]
-    elif len(terms) > 0:
+    elif len(terms) > 0 and term_use == "":
         # Set the term to use as the only available option
         # If there are terms available
         term_use = terms[0]
-    elif BOOL_PRINTS and len(queries) == 0 and len(terms) == 0:
-        print(f"{str_prefix_err} No items found.")
+    elif len(terms) == 0:
+        if BOOL_PRINTS:
+            print(f"{str_prefix_err} No items found.")
         sys.exit() # If no terms, no point in continuing program
 
-    for query in queries:
-        if query["Term"] == term_use or query["Term"] in semesters_accepted(term_use):
-            # If it is the same term as the query, or if the user chose SU,
-            # Still include S1 and S2 classes since it happens at the same time
-            num = ""  # "02" from "TUTR 02". Only used in labs and tutorials
-            if query["Type"] == "TUTR" or query["Type"] == "LAB":
-                num = " " + query["Num2"]
-            # print(f"{course['Department']}/{course['Code']} {course['Num']} {section['Code']} - {type} {num}{meeting['Day']} {meeting['Time']} for {meeting['Duration']} minutes.")
-            weekday_formatted = query["Day"]
-            if weekday_formatted == "R":
-                weekday_formatted = "Th"
-            # Calculate ending time
-            t_1_h = query["Time"].split(":")[0] # Hour, 0-23
-            t_1_m = query["Time"].split(":")[1] # Min,  00-59
-            t_1 = dt.strptime(t_1_h + ":" + t_1_m, "%H:%M")
-            t_2 = t_1 + td(minutes=int(query["Duration"]))
-            t_2 = query["Time"] + "-" + str(int(t_2.strftime("%H"))) + ":" + str(t_2.strftime("%M"))
-            if term_use != query["Term"]:
-                # If the selected term is not the same as this class's term.
-                # Only options are S1 or S2 because otherwise it would have
-                # been stopped before it reaches this point.
-                num += f" ({query['Term']})"
-            if query["Type"] == "LECT":
-                # LECT has its own colour type.
-                # The reason this is separate is to indicate that you could
-                # potentially drop in and also listen to this lecture. This is
-                # less likely in tutorials (TUTR) and seminars (SEMR)
-                latex_newline = "\t\\" + query["Type"].split(" ")[0] + "{" + query['Code'] + " " + query["Num"] + " " + query["Section"] + "}{" + query["Type"] + num + "}{" + weekday_formatted + "}{" + t_2 + "}\n"
-            else:
-                # Automatically use TUTR if it uses an unknown type
-                latex_newline = "\t\\ELSE{" + query['Code'] + " " + query["Num"] + " " + query["Section"] + "}{" + query["Type"] + num + "}{" + weekday_formatted + "}{" + t_2 + "}\n"
-            # print(latex_newline, end="")
-            # latex_newline = "\t\t\\" + type + "{\\href{" + course['URL'] + "}{" + course['Code'] + " " + course['Num'] + " " + section['Code'] + "}}{" + type + num + "}{" + weekday_formatted + "}{" + t_2 + "}\n" # --> With URL to course page. Useless since you have to restart a session anyway
-            arr_latex_newlines.append(latex_newline)
-            if BOOL_PRINT_VERBOSE: # If user wants everything printed
-                print(latex_newline) # Print the LaTeX line
+    # Only read the meetings of the semesters that are going to be shown
+    with profile_stage("Slice"):
+        meetings = index_slice(header, location, semesters_accepted(term_use))
+    profile_add("Slice", Meetings=len(meetings))
     if BOOL_PRINTS:
-        print(f"{str_prefix_info} {len(queries)} items")
+        print(f"{str_prefix_info} {len(meetings)} items")
+    if len(meetings) == 0 and BOOL_STRICT:
+        fail(f"No items found for '{location}' in {term_use}", EXIT_NO_ITEMS)
 
-    class_list = []
-    if len(semesters_accepted(term_use)) > 2:
-        # len(semesters_accepted(term_use)) > 2 explanation:
-        # Only SU and Y terms qualify this. The issue is that the schedule
-        # library in LaTeX does not show multiple events at once, so it takes
-        # the most recent like of the conflicting ones. This means that it may
-        # skip classes. So that there's no data loss, display a list of all the
-        # classes and times normally along with what term it actually is
-        for query in queries:
-            num = ""
-            if query["Type"] == "TUTR" or query["Type"] == "LAB":
-                num = " " + query["Num2"]
-            if term_use != query["Term"]:
-                num += f" ({query['Term']})"
-            class_list.append("\t\\item " + query['Code'] + " " + query["Num"] + " " + query["Section"] + " " + query["Type"] + num + " " + weekday_formatted + " " + t_2 + "\n")
-        class_list = ["All classes in this semester\\footnote{When displaying Y or SU term, there may be conflicts between F/W or S1/S2}\n", "\\begin{itemize*}\n"] + class_list + ["\\end{itemize*}\n"]
-
-
-
-    if len(queries) > 0:
+    if len(meetings) > 0:
         # If there is at least 1 result
-        # Make substitutions for things line title, room, etc.
-        for line_num, line in enumerate(lines_template):
-            lines_template[line_num] = lines_template[line_num].replace("[FILENAME]", FILENAME_OUTPUT)
-            lines_template[line_num] = lines_template[line_num].replace("[DESCRIPTION]", f"Schedule for {location} for {term_use}")
-            lines_template[line_num] = lines_template[line_num].replace("[TITLE]", f"Schedule for {location} for {term_use}")
-            lines_template[line_num] = lines_template[line_num].replace("[COLOR_BG_LECT]", DATA_CONFIG["color_bg_lect"])
-            lines_template[line_num] = lines_template[line_num].replace("[COLOR_BG_ELSE]", DATA_CONFIG["color_bg_else"])
-            lines_template[line_num] = lines_template[line_num].replace("[COLOR_FG_LECT]", DATA_CONFIG["color_fg_lect"])
-            lines_template[line_num] = lines_template[line_num].replace("[COLOR_FG_ELSE]", DATA_CONFIG["color_fg_else"])
-            # TODO: Put this back after "Year" has been added: lines_template[line_num] = lines_template[line_num].replace("[DESCRIPTION]", f"Schedule for {location} in {query['Year']} {term_use}")
-            # TODO: Put this back after "Year" lines_template[line_num] = lines_template[line_num].replace("[TITLE]", f"Schedule for {location} in {query['Year']} {term_use}")
-        lines_new = lines_template[:index_insert] + arr_latex_newlines + lines_template[index_insert+1:index_class_insert] + class_list + lines_template[index_class_insert+1:]
         # If the user inputted the filename using "-o" or "--output"
-        # Check its validity (if it would overwrite a file)
+        # Check its validity (if it would overwrite a file). The extension of
+        # every format is added to the same name ("test" -> "test.tex",
+        # "test.ics", ...)
+        FILENAME_OUTPUT = FILENAME_OUTPUT.strip()
+        if BOOL_STRICT and os.path.basename(output_paths(FILENAME_OUTPUT, formats)[formats[0]]) == OUTPUT_FORMATS[formats[0]][0]:
+            # No name left once the extension is taken off, like "" or "out/"
+            fail("--strict needs an output file name (-o)!", EXIT_MISSING)
         if len(FILENAME_OUTPUT) != 0:
-            if not FILENAME_OUTPUT.endswith(".tex"):
-                FILENAME_OUTPUT = FILENAME_OUTPUT + ".tex"
-            if os.path.exists(FILENAME_OUTPUT):
+            paths = output_paths(FILENAME_OUTPUT, formats)
+            paths_existing = [path for path in paths.values() if os.path.exists(path)]
+            if len(paths_existing) > 0 and BOOL_STRICT:
+                fail(f"{', '.join(paths_existing)} already exists!", EXIT_MISSING)
+            elif len(paths_existing) > 0:
                 # Make sure you are not overwriting an existing file
-                print(f"{str_prefix_err} {FILENAME_OUTPUT} already exists!")
+                print(f"{str_prefix_err} {', '.join(paths_existing)} already exists!")
             else:
                 # When it is a safe file name
                 confirmed_filename = True
         while not confirmed_filename: # If the program still needs a file name
-            FILENAME_OUTPUT = input(f"{str_prefix_q} What would you like to name the output `.tex` file: ").strip()
+            FILENAME_OUTPUT = input(f"{str_prefix_q} What would you like to name the output file: ").strip()
             if len(FILENAME_OUTPUT) == 0:
                 # If the user didn't type anything, give a error + keep asking
                 print(f"{str_prefix_err} You must input a file name!")
             else:
                 # If the user has inputted a file name, check its validity
-                if not FILENAME_OUTPUT.endswith(".tex"):
-                    FILENAME_OUTPUT = FILENAME_OUTPUT + ".tex"
-                if os.path.exists(FILENAME_OUTPUT):
+                paths = output_paths(FILENAME_OUTPUT, formats)
+                paths_existing = [path for path in paths.values() if os.path.exists(path)]
+                if len(paths_existing) > 0:
                     # Make sure you are not overwriting an existing file
-                    print(f"{str_prefix_err} {FILENAME_OUTPUT} already exists! Please pick a different file name.")
+                    print(f"{str_prefix_err} {', '.join(paths_existing)} already exists! Please pick a different file name.")
                 else:
-                    confirmed_filename = yes_or_no(f"Is '{FILENAME_OUTPUT}' correct? ")
+                    confirmed_filename = yes_or_no(f"Is '{', '.join(paths.values())}' correct? ")
+        if DATA_CONFIG is None:
+            DATA_CONFIG, template = load_settings(formats, False)
+        PATH_POST_SCRIPT = DATA_CONFIG["path_post_script"]
 
-        # Write to file
-        open(FILENAME_OUTPUT, "w").writelines(lines_new)
-        if BOOL_PRINTS:
-            print(f"{str_prefix_done} Wrote to '{FILENAME_OUTPUT}'")
+        for format_output, PATH_OUTPUT in paths.items():
+            with profile_stage("Render"):
+                text_new = OUTPUT_FORMATS[format_output][2](location, term_use, meetings, template, DATA_CONFIG, PATH_OUTPUT)
+
+            # Write to file
+            with profile_stage("Write"):
+                open(PATH_OUTPUT, "w").write(text_new)
+            profile_add("Write", Bytes=len(text_new))
+            if BOOL_PRINTS:
+                print(f"{str_prefix_done} Wrote to '{PATH_OUTPUT}'")
 
-        # Run post-script (if there is one)
-        if len(PATH_POST_SCRIPT) > 0:
+        # Run post-script (if there is one). It is only made for `.tex` files
+        if len(PATH_POST_SCRIPT) > 0 and "tex" in paths:
             if BOOL_PRINTS:
                 print(f"{str_prefix_info} Detected post-script. Running...")
-            os.system(f"{PATH_POST_SCRIPT} \"{FILENAME_OUTPUT}\"")
+            run_post_script(PATH_POST_SCRIPT, paths["tex"], False)
 
     sys.exit() # Exit program with no erros
 
 
+# Output format -> (file extension, content type, function that makes it)
+OUTPUT_FORMATS = {
+    "tex": (".tex", "application/x-tex", render_tex),
+    "csv": (".csv", "text/csv", render_csv),
+    "html": (".html", "text/html", render_html),
+    "ics": (".ics", "text/calendar", render_ics)
+    }
+
+SUBCOMMANDS = {
+    "convert": main_convert,
+    "free": main_free
+    }
+
+
 if __name__ == "__main__":
     main()